@@ -1,22 +1,24 @@
 # app.py
 import os
 import json
-import threading
+import time
 import logging
-from flask import Flask, request, jsonify, render_template, abort, redirect, url_for, flash 
+from flask import Flask, request, jsonify, render_template, abort, redirect, url_for, flash, Response
 import markdown
 import re # used for renaming the channel folder 
 from dotenv import load_dotenv
-import psycopg2
 
-from datetime import datetime
-from youtube_utils import download_channel_transcripts, list_downloaded_videos
-from summarizer_v2 import chunk_transcript, build_prompts_for_chunk, ollama_generate_chunk
+from youtube_utils import list_downloaded_videos
+from summarizer_v2 import get_summarize_mode
+from ollama_pool import get_pool
+import job_queue
+import chat
+import answer_cache
+from jobs import HANDLERS
 from auth_utils import get_current_user
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.sql import text
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker, undefer_group
 
 from functools import wraps
 
@@ -43,15 +45,71 @@ logger = logging.getLogger(__name__)
 
 #Read the env file
 load_dotenv()
-ollama_host = os.getenv("REMOTE_OLLAMA_HOST")
-print(f"ollama_host: {ollama_host}")
-# Build a full URL for Ollama, typically port 11434
-OLLAMA_URL = f"http://{ollama_host}:11434"
 
-# In-memory storage for statuses (for demo). 
-# For production, use a database or a caching layer (Redis).
-download_statuses = {}
-summarize_v2_statuses = {}
+# Downloads and summaries run as jobs in the Postgres-backed queue
+# (job_queue.py). EMBEDDED_WORKERS threads in the serving process work the
+# queue; run_worker.py adds more workers (or set EMBEDDED_WORKERS=0 and use
+# only those). They are started by init_workers() from wsgi.py and the dev
+# server below, not on import, so scripts and `flask shell` importing this
+# module don't run jobs.
+_workers_started = False
+
+
+def init_workers():
+    """
+    Start this process's embedded job workers (once).
+    """
+    global _workers_started
+    if not _workers_started:
+        _workers_started = True
+        job_queue.start_embedded_workers(HANDLERS)
+
+TASK_ID_PREFIXES = {"download": "dl", "summarize": "summ_v2"}
+
+
+def task_id_for(job_id, job_type, refresh=False):
+    """
+    Public task id for a job, e.g. "dl_12", "refresh_13", "summ_v2_14".
+    """
+    prefix = "refresh" if refresh else TASK_ID_PREFIXES.get(job_type, job_type)
+    return f"{prefix}_{job_id}"
+
+
+def task_summary(job):
+    """
+    What the status page shows for a job: counts, chunk progress, rate and
+    ETA, and only the last TASK_ERRORS_SHOWN errors (plus the total).
+    """
+    progress = job["progress"]
+    errors = job["errors"]
+    shown = int(os.getenv("TASK_ERRORS_SHOWN", "5"))
+    return {
+        "task_id": task_id_for(job["id"], job["job_type"], refresh="refresh" in job["payload"]),
+        "type": job["job_type"],
+        "status": job["status"],
+        "processed": job["processed"],
+        "total": job["total"],
+        "chunks_done": progress.get("chunks_done"),
+        "chunks_total": progress.get("chunks_total"),
+        "tokens_per_second": progress.get("tokens_per_second"),
+        "eta_seconds": progress.get("eta_seconds") if job["status"] in ("in_progress", "paused") else None,
+        "error_count": max(progress.get("error_count", 0), len(errors)),
+        "errors": errors[-shown:] if shown > 0 else [],
+    }
+
+
+def get_task_status(task_id, job_type):
+    """
+    Status dict of the job behind task_id (if it is of job_type), or None.
+    """
+    try:
+        job_id = int(task_id.rsplit("_", 1)[-1])
+    except ValueError:
+        return None
+    job = job_queue.get_job(job_id)
+    if not job or job["job_type"] != job_type:
+        return None
+    return {**job["progress"], "status": job["status"], "errors": job["errors"]}
 
 
 # Define a decorator to require a specific role
@@ -150,40 +208,19 @@ def api_channel_start():
         return jsonify({"status": "error", "message": "No channel_url provided"}), 400
 
     channel_url = data['channel_url'].strip()
-    # Generate a unique task ID for tracking 
-    task_id = f"dl_{len(download_statuses)+1}"
-
-    # Initialize the task status in memory
-    download_statuses[task_id] = {
-        "status": "in_progress",
-        "processed": 0,
-        "total": 0,
-        "errors": []
-    }
-
-    def run_download():
-        try:
-            # This function now ensures that for every video,
-            # a row in video_folders(folder_name=<channel_id>, video_id=...) is inserted
-            download_channel_transcripts(channel_url, download_statuses[task_id])
-            download_statuses[task_id]["status"] = "completed"
-        except Exception as e:
-            logger.error(f"Error in channel download: {e}")
-            download_statuses[task_id]["status"] = "failed"
-            download_statuses[task_id]["errors"].append(str(e))
 
-    # Run the download in a background thread so we don’t block the Flask request
-    thread = threading.Thread(target=run_download, daemon=True)
-    thread.start()
+    # Queue the download so we don't block the Flask request; a worker
+    # ensures that for every video a video_folders row is inserted.
+    job_id = job_queue.enqueue("download", {"channel_url": channel_url})
 
-    return jsonify({"status": "initiated", "task_id": task_id})
+    return jsonify({"status": "initiated", "task_id": task_id_for(job_id, "download")})
 
 @app.route('/api/channel/status/<task_id>', methods=['GET'])
 def api_channel_status(task_id):
     """
     Returns the status of an ongoing channel download process.
     """
-    status = download_statuses.get(task_id)
+    status = get_task_status(task_id, "download")
     if not status:
         return jsonify({"status": "error", "message": "Invalid task ID"}), 404
     return jsonify(status)
@@ -223,7 +260,8 @@ def api_get_videos(channel_name):
                 query = query.order_by(Video.upload_date.desc())
 
         # 3) Pagination
-        total = query.count()
+        # Count on the key only; Query.count() would wrap every column, deferred ones included
+        total = query.order_by(None).with_entities(func.count(Video.video_id)).scalar()
         offset = (page - 1) * page_size
         video_rows = query.offset(offset).limit(page_size).all()
 
@@ -264,8 +302,11 @@ def api_summarize_v2():
     Generate a "v2" summary for multiple videos (SummariesV2).
     - If the channel_id folder association doesn't exist, create it
     - If a SummariesV2 row (video_id, summary_type="ollama_v2", model_name=...) already exists, skip
-    - Enhanced chunking by sentences, fallback to word-splitting
+    - Token-aware chunking sized to the model's context window
     - Enhanced prompt instructions
+    - Optional "mode": "prompts" (four prompts per chunk), "shared" (four
+      prompts with the chunk as common prefix) or "structured" (one JSON
+      call per chunk); defaults to SUMMARIZE_MODE
     """
     data = request.get_json() or {}
     channel_name = data.get("channel_name", "").strip()
@@ -275,135 +316,35 @@ def api_summarize_v2():
     if not channel_name or not video_ids:
         return jsonify({"status": "error", "message": "channel_id or video_ids missing"}), 400
 
-    task_id = f"summ_v2_{len(summarize_v2_statuses)+1}"
-    summarize_v2_statuses[task_id] = {
-        "status": "in_progress",
-        "processed": 0,
-        "total": len(video_ids),
-        "errors": []
-    }
-
-    def run_summarize_v2():
-        session = SessionLocal()
-        processed_count = 0
-        try:
-            for vid in video_ids:
-                # 1) Ensure folder association
-                existing_folder = session.query(VideoFolder).filter_by(
-                    folder_name=channel_name, 
-                    video_id=vid
-                ).first()
-                if not existing_folder:
-                    folder_assoc = VideoFolder(
-                        folder_name=channel_name,
-                        video_id=vid,
-                        last_modified=datetime.utcnow()
-                    )
-                    session.add(folder_assoc)
-                    session.commit()
-
-                # 2) Skip if SummariesV2 row exists
-                existing_summary = (
-                    session.query(SummariesV2)
-                    .filter_by(
-                        video_id=vid, 
-                        model_name=model_name
-                    )
-                    .first()
-                )
-                if existing_summary:
-                    logger.info(f"[SummariesV2] Skipping {vid}, summary already exists for model='{model_name}'.")
-                    processed_count += 1
-                    summarize_v2_statuses[task_id]["processed"] = processed_count
-                    continue
-
-                # 3) Fetch video
-                video_obj = session.query(Video).filter_by(video_id=vid).first()
-                if not video_obj:
-                    msg = f"Video {vid} not found in DB."
-                    logger.error(msg)
-                    summarize_v2_statuses[task_id]["errors"].append(msg)
-                    processed_count += 1
-                    summarize_v2_statuses[task_id]["processed"] = processed_count
-                    continue
-
-                # 4) Get transcript
-                transcript = video_obj.transcript_no_ts or ""
-                tokens_no_ts = video_obj.tokens_no_ts or 0
-                if tokens_no_ts <= 0:
-                    # fallback: naive word count
-                    tokens_no_ts = len(transcript.split())
-
-                # 5) Enhanced chunking
-                if tokens_no_ts <= 4000:
-                    chunked_texts = [transcript]
-                else:
-                    chunked_texts = chunk_transcript(transcript, max_words_per_chunk=4000)
-
-                # 6) Summaries accumulators
-                all_concise = []
-                all_topics = []
-                all_takeaways = []
-                all_comprehensive = []
-
-                # 7) For each chunk, run the four prompts
-                for chunk_str in chunked_texts:
-                    prompts = build_prompts_for_chunk(chunk_str)
-
-                    c_text = ollama_generate_chunk(model_name, prompts["concise"])
-                    kt_text = ollama_generate_chunk(model_name, prompts["key_topics"])
-                    tk_text = ollama_generate_chunk(model_name, prompts["takeaways"])
-                    cp_text = ollama_generate_chunk(model_name, prompts["comprehensive"])
-
-                    all_concise.append(c_text)
-                    all_topics.append(kt_text)
-                    all_takeaways.append(tk_text)
-                    all_comprehensive.append(cp_text)
-
-                # 8) Merge partial results
-                final_concise = "\n".join(all_concise).strip()
-                final_topics = "\n".join(all_topics).strip()
-                final_takeaways = "\n".join(all_takeaways).strip()
-                final_comprehensive = "\n".join(all_comprehensive).strip()
-
-                # 9) Insert SummariesV2 row
-                new_summary = SummariesV2(
-                    video_id=vid,
-                    video_title=video_obj.title,
-                    model_name=model_name,
-                    date_generated=datetime.utcnow(),
-                    concise_summary=final_concise,
-                    key_topics=final_topics,
-                    important_takeaways=final_takeaways,
-                    comprehensive_notes=final_comprehensive
-                )
-                session.add(new_summary)
-                session.commit()
-
-                logger.info(f"[SummariesV2] Inserted for video={vid}, model={model_name}")
-                processed_count += 1
-                summarize_v2_statuses[task_id]["processed"] = processed_count
-
-            summarize_v2_statuses[task_id]["status"] = "completed"
-        except Exception as e:
-            logger.error(f"[SummariesV2] Error: {e}")
-            summarize_v2_statuses[task_id]["status"] = "failed"
-            summarize_v2_statuses[task_id]["errors"].append(str(e))
-        finally:
-            session.close()
-
-    # spawn background thread
-    thread = threading.Thread(target=run_summarize_v2, daemon=True)
-    thread.start()
+    try:
+        mode = get_summarize_mode(data.get("mode"))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    # Queued in Postgres; any worker (embedded or run_worker.py) picks it up.
+    # A request already covered by a queued or running job for the same
+    # channel and model attaches to that job instead of starting another.
+    job_id, created = job_queue.enqueue_coalesced(
+        "summarize",
+        {
+            "channel_name": channel_name,
+            "video_ids": video_ids,
+            "model": model_name,
+            "mode": mode
+        },
+        match=("channel_name", "model"),
+        contains={"video_ids": video_ids}
+    )
+    task_id = task_id_for(job_id, "summarize")
 
-    return jsonify({"status": "initiated", "task_id": task_id})
+    return jsonify({"status": "initiated", "task_id": task_id, "attached": not created})
 
 @app.route("/api/summarize_v2/status/<task_id>", methods=["GET"])
 def api_summarize_v2_status(task_id):
     """
     Returns progress for the SummariesV2 generation task.
     """
-    status = summarize_v2_statuses.get(task_id)
+    status = get_task_status(task_id, "summarize")
     if not status:
         return jsonify({"status": "error", "message": "Invalid task ID"}), 404
     return jsonify(status)
@@ -498,10 +439,13 @@ def api_rename_channel():
 def api_refresh_channel():
     """
     Refresh the channel using the immutable original_playlist_id.
-    Expects JSON: { "channel_name": "HumanFriendlyChannelName" }
+    Expects JSON: { "channel_name": "HumanFriendlyChannelName", "full": false }
+    By default only uploads newer than the last refresh are listed;
+    pass "full": true to force a complete relist of the playlist.
     """
     data = request.get_json() or {}
     channel_name_input = data.get("channel_name", "").strip()
+    force_full = bool(data.get("full", False))
     if not channel_name_input:
         return jsonify({"status": "error", "message": "Channel name missing"}), 400
 
@@ -527,31 +471,17 @@ def api_refresh_channel():
         # Build the YouTube playlist URL using the original playlist id.
         channel_url = f"https://www.youtube.com/playlist?list={original_playlist_id}"
 
-        # Generate a task ID using the human-friendly name.
-        task_id = f"refresh_{human_playlist_name}_{int(datetime.utcnow().timestamp())}"
-        download_statuses[task_id] = {
-            "status": "in_progress",
-            "processed": 0,
-            "total": 0,
-            "errors": []
-        }
-
-        def run_refresh():
-            try:
-                # This function (download_channel_transcripts) uses the updated logic:
-                # It checks for an existing folder association (using original_playlist_id)
-                # so that videos that already exist are not re-added.
-                download_channel_transcripts(channel_url, download_statuses[task_id])
-                download_statuses[task_id]["status"] = "completed"
-            except Exception as e:
-                logger.error(f"Error in channel refresh: {e}")
-                download_statuses[task_id]["status"] = "failed"
-                download_statuses[task_id]["errors"].append(str(e))
-
-        thread = threading.Thread(target=run_refresh, daemon=True)
-        thread.start()
-
-        return jsonify({"status": "initiated", "task_id": task_id})
+        # The download job checks for an existing folder association
+        # (using original_playlist_id) so that videos that already exist
+        # are not re-added.
+        job_id = job_queue.enqueue("download", {
+            "channel_url": channel_url,
+            "playlist_id": original_playlist_id,
+            "incremental": not force_full,
+            "refresh": human_playlist_name
+        })
+
+        return jsonify({"status": "initiated", "task_id": task_id_for(job_id, "download", refresh=True)})
     finally:
         session.close()
 
@@ -612,53 +542,92 @@ def api_all_tasks():
     """
     Return a list of all tasks (downloads and summaries) in a single JSON array.
     """
-    all_tasks = []
-
-    # For download tasks
-    for task_id, stat in download_statuses.items():
-        all_tasks.append({
-            "task_id": task_id,
-            "type": "download",
-            "status": stat["status"],
-            "processed": stat["processed"],
-            "total": stat["total"],
-            "errors": stat["errors"]
-        })
+    # Most recent jobs from the queue (JOB_LIST_LIMIT)
+    return jsonify([task_summary(job) for job in job_queue.list_jobs()])
 
-    # For summarize tasks
-    for task_id, stat in summarize_v2_statuses.items():
-        all_tasks.append({
-            "task_id": task_id,
-            "type": "summarize",
-            "status": stat["status"],
-            "processed": stat["processed"],
-            "total": stat["total"],
-            "errors": stat["errors"]
-        })
 
-    return jsonify(all_tasks)
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
 
-@app.route("/api/ollama/models", methods=["GET"])
-def api_ollama_models():
+@app.route("/api/tasks/stream", methods=["GET"])
+def api_tasks_stream():
     """
-    Returns a JSON list of Ollama models from your remote instance.
-    Example JSON: { "models": [ { "name": "phi4" }, { "name": "llama2" } ] }
+    Server-sent events for the status page: one "snapshot" event with the
+    current task list, then a "task" event with only the changed fields
+    whenever a job changes (pushed via LISTEN/NOTIFY, so nothing is queried
+    while jobs are idle). The stream ends after TASK_STREAM_MAX_SECONDS;
+    EventSource reconnects and gets a fresh snapshot.
+
+    Each open stream holds a server thread, so a process serves at most
+    TASK_STREAM_MAX_CLIENTS of them (they share one LISTEN connection);
+    beyond that it answers 503 and the page polls /api/all-tasks instead.
     """
-    # e.g., using the 'requests' library or your 'ollama' python client
-    import requests
+    max_seconds = float(os.getenv("TASK_STREAM_MAX_SECONDS", "300"))
 
-    ollama_host = os.getenv("REMOTE_OLLAMA_HOST", "localhost")
-    url = f"http://{ollama_host}:11434/v1/models"
+    listener = job_queue.listen()
+    try:
+        next(listener)  # listening; the snapshot is taken in stream()
+    except job_queue.TooManyListeners as e:
+        logger.info(f"Refusing task stream: {e}")
+        return jsonify({"error": "Too many status streams; poll /api/all-tasks instead."}), 503
+
+    def stream():
+        deadline = time.monotonic() + max_seconds
+        tasks = [task_summary(job) for job in job_queue.list_jobs()]
+        sent = {task["task_id"]: task for task in tasks}
+        yield "retry: 3000\n" + _sse("snapshot", tasks)
+
+        for job_ids in listener:
+            if time.monotonic() > deadline:
+                return
+            if not job_ids:
+                yield ": keepalive\n\n"
+                continue
+            for job in job_queue.get_jobs(job_ids):
+                task = task_summary(job)
+                previous = sent.get(task["task_id"], {})
+                delta = {key: value for key, value in task.items() if previous.get(key) != value}
+                if delta:
+                    sent[task["task_id"]] = task
+                    yield _sse("task", {"task_id": task["task_id"], **delta})
+
+    response = Response(stream(), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    # Also runs if the stream never starts, unlike a finally in stream().
+    response.call_on_close(listener.close)
+    return response
 
+
+@app.route("/api/ollama/models", methods=["GET"])
+def api_ollama_models():
+    """
+    Returns a JSON list of the models available on the Ollama backends, in
+    the OpenAI /v1/models shape the pages expect:
+    { "object": "list", "data": [ { "id": "phi4:latest", ... }, ... ] }
+    Served from the pool's cached model lists (refreshed in the background).
+    """
     try:
-        resp = requests.get(url, timeout=10)
-        resp.raise_for_status()
-        data = resp.json()  # likely { "models": [ { "name": "..." }, ... ] }
-        return jsonify(data)
+        models = get_pool().list_models()
     except Exception as e:
         logger.error(f"Failed to list Ollama models: {e}")
-        return jsonify({"models": []}), 500
+        models = []
+    if not models:
+        return jsonify({"object": "list", "data": []}), 500
+    return jsonify({
+        "object": "list",
+        "data": [{"id": name, "object": "model", "owned_by": "library"} for name in models]
+    })
+
+
+@app.route("/api/ollama/scheduler", methods=["GET"])
+def api_ollama_scheduler():
+    """
+    Ollama pool stats for this process: per backend its health, latency,
+    load and loaded models, plus its scheduler's model swaps, queue lengths,
+    throughput and wait times; and failover / hedging counts.
+    """
+    return jsonify(get_pool().stats())
 
 
 @app.route("/summaries_v2/<int:summary_id>", methods=["GET"])
@@ -670,11 +639,12 @@ def view_summary_v2(summary_id):
     """
     session = SessionLocal()
     try:
-        summary_obj = session.query(SummariesV2).get(summary_id)
+        summary_obj = session.get(SummariesV2, summary_id, options=[undefer_group("summary")])
         if not summary_obj:
             return f"SummariesV2 with ID {summary_id} not found.", 404
         
-        video = summary_obj.video  # Because SummariesV2.video is the relationship
+        # The template shows both transcripts, so load the deferred group up front
+        video = session.get(Video, summary_obj.video_id, options=[undefer_group("transcript")])
 
         # Convert each of the 4 fields from markdown => HTML
         concise_html = markdown.markdown(summary_obj.concise_summary or "")
@@ -703,7 +673,7 @@ def view_transcript_v2(video_id):
     """
     session = SessionLocal()
     try:
-        video_obj = session.query(Video).get(video_id)
+        video_obj = session.get(Video, video_id, options=[undefer_group("transcript")])
         if not video_obj:
             return f"Video with ID {video_id} not found.", 404
         
@@ -761,11 +731,7 @@ def api_chat_channel(channel_name):
     data = request.json or {}
     user_query = data.get("query", "").strip()
     data_type = data.get("data_type", "comprehensive_notes")
-    model_name = data.get("model_name", "phi4:latest")  # default fallback
-
-    # temporary work around - if model_name = "deepseek-r1:32b" change it to "gemma2:27b"
-    if model_name == "deepseek-r1:32b":
-        model_name = "gemma2:27b"
+    model_name = _chat_channel_model(data)
 
     if not user_query:
         return jsonify({"answer": "No query provided."}), 400
@@ -773,131 +739,33 @@ def api_chat_channel(channel_name):
     logger.info(f"Chat-channel query for channel={channel_name}, "
                 f"user_query='{user_query}', data_type='{data_type}', model='{model_name}'")
 
-    # 1) Map data_type to the relevant embeddings view
-    EMBEDDINGS_VIEW_MAP = {
-        "comprehensive_notes": "public.summaries_v2_comprehensive_notes_embedding",
-        "concise_summary":     "public.summaries_v2_concise_summary_embedding",
-        "key_topics":          "public.summaries_v2_key_topics_embedding",
-        "important_takeaways": "public.summaries_v2_important_takeaways_embedding",
-        "transcript":          "public.videos_embedding"
-    }
-    selected_view = EMBEDDINGS_VIEW_MAP.get(data_type, EMBEDDINGS_VIEW_MAP["comprehensive_notes"])
-
     session = SessionLocal()
     try:
-        # 2) Embed the user query with the chosen model
-        sql_embed = text("""
-            SELECT ai.ollama_embed(
-                :model_name,
-                :query_text,
-                :ollama_url
-            ) AS user_query_emb
-        """)
-
-        user_query_emb = session.execute(sql_embed, {
-            "model_name": "nomic-embed-text:latest", 
-            "query_text": user_query,
-            "ollama_url": OLLAMA_URL
-        }).scalar()
-
-        if not user_query_emb:
-            return jsonify({"answer": "Failed to get embedding for user query."}), 500
-
-        # 3) Retrieve relevant chunks from the selected view
-        sql_top_chunks = text(f"""
-            SELECT 
-                ev.chunk,
-                ev.video_id,
-                v.title AS video_title,
-                1 - (ev.embedding <=> :q_emb) AS similarity
-            FROM {selected_view} ev
-            JOIN video_folders vf ON ev.video_id = vf.video_id
-            JOIN videos v        ON ev.video_id = v.video_id
-            WHERE vf.folder_name = :chan
-            ORDER BY similarity DESC
-            LIMIT 5
-        """)
-
-        chunk_rows = session.execute(sql_top_chunks, {
-            "q_emb": user_query_emb,
-            "chan": channel_name
-        }).fetchall()
+        # 0) Same question answered before, and the channel's content unchanged?
+        scope = chat.answer_scope(channel_name=channel_name)
+        fingerprint = chat.scope_fingerprint(session, data_type, channel_name=channel_name)
+        cached = answer_cache.lookup(scope, data_type, model_name, user_query, fingerprint)
+        if cached:
+            final_answer, unique_videos = cached
+            return jsonify({"answer": markdown.markdown(final_answer) + chat.used_videos_html(unique_videos)})
+
+        # 1-2) Embed the user query and retrieve relevant chunks from the
+        #      selected view (one statement; the vector stays in Postgres)
+        chunk_rows = chat.retrieve_channel_chunks(session, channel_name, data_type, user_query)
 
         if not chunk_rows:
             final_answer = "No relevant content found for this channel and data type."
             used_videos_html = ""
         else:
-            context_pieces = []
-            unique_videos = {}
-
-            for row in chunk_rows:
-                chunk_text = row[0]
-                chunk_vid_id = row[1]
-                chunk_vid_title = row[2]
-                similarity = row[3]
-
-                context_pieces.append(f"Chunk (similarity={similarity:.4f}): {chunk_text}")
-                unique_videos[chunk_vid_id] = chunk_vid_title
-
-            context_for_generation = "\n\n".join(context_pieces)
-
-            # 4) Generate final answer (embedding is done; now we do text generation)
-            sql_generate = text("""
-                SELECT ai.ollama_generate(
-                    :model_name,
-                    :prompt,
-                    :ollama_url
-                ) AS answer
-            """)
-
-            prompt_str = f"""
-Context:
-{context_for_generation}
-
-User Query:
-{user_query}
-
-Please provide a concise answer:
-"""
-
-            result_json = session.execute(sql_generate, {
-                "model_name": model_name,
-                "prompt": prompt_str,
-                "ollama_url": OLLAMA_URL
-            }).scalar()
-
-            if not result_json:
+            # 3) Generate final answer (embedding is done; now we do text generation)
+            prompt_str, unique_videos = chat.build_channel_prompt(chunk_rows, user_query)
+            final_answer = chat.generate_answer(session, model_name, prompt_str)
+            if final_answer is None:
                 final_answer = "No answer was returned by the model."
             else:
-                final_answer = result_json.get("response", "[No response in JSON]")
-
-            # same logic to append the used_videos_html
-            if unique_videos:
-                used_videos_html = "<h4>Videos used in Context:</h4>\n<ul>\n"
-                for vid_id, vid_title in unique_videos.items():
-                    used_videos_html += f"""
-<li>
-    <a href="https://www.youtube.com/watch?v={vid_id}" target="_blank">
-        <svg style="fill:#333; height:1em; width:1em;" version="1.1"
-             xmlns="http://www.w3.org/2000/svg"
-             xmlns:xlink="http://www.w3.org/1999/xlink"
-             viewBox="0 0 48 48" xml:space="preserve">
-            <use href="#icon-summarizeYouTube" xlink:href="#icon-summarizeYouTube"></use>
-        </svg>
-    </a>
-    &nbsp;
-    <a href="/chat-video/{vid_id}">
-        <svg xmlns="http://www.w3.org/2000/svg" height="24px"
-             viewBox="0 -960 960 960" width="24px">
-            <path d="M240-400h320v-80H240v80Zm0-120h480v-80H240v80Zm0-120h480v-80H240v80ZM80-80v-720q0-33 23.5-56.5T160-880h640q33 0 56.5 23.5T880-800v480q0 33-23.5 56.5T800-240H240L80-80Zm126-240h594v-480H160v525l46-45Zm-46 0v-480 480Z"/>
-        </svg>
-    </a>
-    {vid_title}
-</li>
-"""
-                used_videos_html += "</ul>\n"
-            else:
-                used_videos_html = ""
+                answer_cache.store(scope, data_type, model_name, user_query, fingerprint,
+                                   final_answer, unique_videos)
+            used_videos_html = chat.used_videos_html(unique_videos)
 
     except Exception as e:
         logger.exception("Error during chat-channel flow:")
@@ -912,6 +780,94 @@ Please provide a concise answer:
 
     return jsonify({"answer": final_answer_html})
 
+
+@app.route("/api/chat-channel/<channel_name>/stream", methods=["POST"])
+def api_chat_channel_stream(channel_name):
+    """
+    Streaming variant of api_chat_channel (same JSON body). Responds with
+    server-sent events: "token" events with the answer as it is generated,
+    then "sources" (the videos used as context) and "done" with the final
+    answer rendered as HTML, exactly as the non-streaming endpoint returns it.
+    Retrieval happens before the stream starts, so its errors are plain
+    JSON responses.
+    """
+    data = request.json or {}
+    user_query = data.get("query", "").strip()
+    data_type = data.get("data_type", "comprehensive_notes")
+    model_name = _chat_channel_model(data)
+
+    if not user_query:
+        return jsonify({"answer": "No query provided."}), 400
+
+    logger.info(f"Streaming chat-channel query for channel={channel_name}, "
+                f"user_query='{user_query}', data_type='{data_type}', model='{model_name}'")
+
+    session = SessionLocal()
+    try:
+        scope = chat.answer_scope(channel_name=channel_name)
+        fingerprint = chat.scope_fingerprint(session, data_type, channel_name=channel_name)
+        cached = answer_cache.lookup(scope, data_type, model_name, user_query, fingerprint)
+        if cached:
+            final_answer, unique_videos = cached
+            return _chat_event_stream(None, None, final_answer, videos=unique_videos)
+
+        chunk_rows = chat.retrieve_channel_chunks(session, channel_name, data_type, user_query)
+    except Exception as e:
+        logger.exception("Error during chat-channel retrieval:")
+        return jsonify({"answer": f"Error: {str(e)}"}), 500
+    finally:
+        session.close()
+
+    if not chunk_rows:
+        return _chat_event_stream(None, None, "No relevant content found for this channel and data type.")
+
+    prompt_str, unique_videos = chat.build_channel_prompt(chunk_rows, user_query)
+    return _chat_event_stream(
+        model_name, prompt_str, videos=unique_videos,
+        on_answer=lambda answer: answer_cache.store(
+            scope, data_type, model_name, user_query, fingerprint, answer, unique_videos)
+    )
+
+
+def _chat_channel_model(data):
+    model_name = data.get("model_name", "phi4:latest")  # default fallback
+
+    # temporary work around - if model_name = "deepseek-r1:32b" change it to "gemma2:27b"
+    if model_name == "deepseek-r1:32b":
+        model_name = "gemma2:27b"
+    return model_name
+
+
+def _chat_event_stream(model_name, prompt, fallback_answer=None, videos=None, on_answer=None):
+    """
+    SSE response streaming the model's answer to prompt (or just
+    fallback_answer when there is nothing to ask, e.g. a cached answer).
+    on_answer(answer), if given, gets the complete generated answer (to
+    cache it) once the stream has finished.
+    """
+    def stream():
+        pieces = []
+        try:
+            if prompt is not None:
+                for piece in chat.stream_answer(model_name, prompt):
+                    pieces.append(piece)
+                    yield _sse("token", {"text": piece})
+            answer = "".join(pieces) or fallback_answer or "No answer was returned by the model."
+            if pieces and on_answer:
+                on_answer(answer)
+            sources_html = chat.used_videos_html(videos or {})
+            yield _sse("sources", {
+                "videos": [{"video_id": vid, "title": title} for vid, title in (videos or {}).items()],
+                "html": sources_html
+            })
+            yield _sse("done", {"answer": markdown.markdown(answer) + sources_html})
+        except Exception as e:
+            logger.exception("Error while streaming chat answer")
+            yield _sse("error", {"answer": f"Error: {e}"})
+
+    return Response(stream(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.route("/chat-video/<video_id>", methods=["GET"])
 def chat_video_page(video_id):
     """
@@ -922,7 +878,12 @@ def chat_video_page(video_id):
     session = SessionLocal()
     try:
         # Fetch the specific video
-        video = session.query(Video).filter_by(video_id=video_id).first()
+        video = (
+            session.query(Video)
+            .options(undefer_group("transcript"))
+            .filter_by(video_id=video_id)
+            .first()
+        )
 
         if not video:
             return f"Video with id '{video_id}' not found.", 404
@@ -954,78 +915,32 @@ def api_chat_video(video_id):
 
     logger.info(f"Chat-video query for video_id={video_id}, user_query={user_query}, data_type={data_type}")
 
-    # 1) Create a small lookup dict that maps data_type to the relevant embeddings store
-    #    e.g. the "destination =>" string you used in create_vectorizer
-    #    or your actual table/view names for each embedding.
-    #    Example names are placeholders—adjust to match your actual vectorizer output.
-    EMBEDDINGS_TABLE_MAP = {
-        "comprehensive_notes": "public.summaries_v2_comprehensive_notes_embedding",
-        "concise_summary":     "public.summaries_v2_concise_summary_embedding",
-        "key_topics":          "public.summaries_v2_key_topics_embedding",
-        "important_takeaways": "public.summaries_v2_important_takeaways_embedding",
-        "transcript":          "public.videos_embedding"
-    }
-
-    # If the user chose something not in the map, default to comprehensive_notes
-    selected_table = EMBEDDINGS_TABLE_MAP.get(data_type, EMBEDDINGS_TABLE_MAP["comprehensive_notes"])
-
-    # 2) Connect to your DB
-    conn = psycopg2.connect(DB_URL)  # or however you do this
+    session = SessionLocal()
     try:
-        cur = conn.cursor()
-
-        # 3) Embed the user_query
-        #    We'll do something like:
-        #    SELECT ai.ollama_embed('nomic-embed-text', user_query, base_url)
-        embed_sql = """
-            SELECT ai.ollama_embed('nomic-embed-text', %s, %s)
-        """
-        cur.execute(embed_sql, (user_query, OLLAMA_URL))
-        user_query_embedding = cur.fetchone()[0]  # Store the embedding array
-
-        # 4) SELECT relevant chunks from the chosen embeddings table
-        #    If you need to filter by video_id, ensure you stored it as metadata.
-        #    Example if your chunking stored 'video_id' in a column named 'video_id':
-        #    SELECT chunk from selected_table WHERE video_id=%s ORDER BY (embedding <=> user_query_embedding) ASC
-        #    or something similar. 
-        #    Also note 1-(emb <=> query) is "similarity" if you want descending order. 
-        #    Alternatively you can do embedding distance ascending order.
-        select_chunks_sql = f"""
-            SELECT chunk,
-                   1 - (embedding <=> %s) AS similarity
-              FROM {selected_table}
-             WHERE video_id = %s
-             ORDER BY similarity DESC
-             LIMIT 5
-        """
-        cur.execute(select_chunks_sql, (user_query_embedding, video_id))
-        rows = cur.fetchall()
-
-        # 5) Concatenate the top relevant chunks
-        context = "\n\n".join([f"Chunk: {r[0]}" for r in rows])
-
-        # 6) Generate a final answer with ai.ollama_generate or ai.ollama_chat_complete.
-        #    Simple example with ai.ollama_generate. 
-        #    We wrap the context and user query into a single prompt.
-        generate_sql = """
-            SELECT ai.ollama_generate(
-                'gemma2:27b',              -- or your model name
-                %s,                        -- prompt
-                %s                         -- base_url
-            );
-        """
-        prompt_text = f"Query: {user_query}\nContext:\n{context}"
-        cur.execute(generate_sql, (prompt_text, OLLAMA_URL))
-        result_json = cur.fetchone()[0]  # e.g. { "response": "...", "done": True, ... }
-
-        final_answer = result_json.get("response", "[No response in JSON]")
-
-        cur.close()
+        # 0) Same question answered before, and the video's content unchanged?
+        scope = chat.answer_scope(video_id=video_id)
+        fingerprint = chat.scope_fingerprint(session, data_type, video_id=video_id)
+        cached = answer_cache.lookup(scope, data_type, chat.VIDEO_CHAT_MODEL, user_query, fingerprint)
+        if cached:
+            return jsonify({"answer": markdown.markdown(cached[0])})
+
+        # 1-2) Embed the user_query and SELECT relevant chunks of this video
+        #      from the chosen embeddings view, in one statement
+        rows = chat.retrieve_video_chunks(session, video_id, data_type, user_query,
+                                          model_name="nomic-embed-text")
+
+        # 3) Generate a final answer from the top chunks and the query
+        prompt_text = chat.build_video_prompt(rows, user_query)
+        final_answer = chat.generate_answer(session, chat.VIDEO_CHAT_MODEL, prompt_text)
+        if final_answer is None:
+            final_answer = "[No response in JSON]"
+        else:
+            answer_cache.store(scope, data_type, chat.VIDEO_CHAT_MODEL, user_query, fingerprint, final_answer)
     except Exception as e:
         logger.exception("Error while handling chat-video")
         final_answer = f"Error: {e}"
     finally:
-        conn.close()
+        session.close()
 
     # Convert final_answer from markdown to HTML
     final_answer_html = markdown.markdown(final_answer)
@@ -1033,6 +948,41 @@ def api_chat_video(video_id):
     return jsonify({"answer": final_answer_html})
 
 
+@app.route("/api/chat-video/<video_id>/stream", methods=["POST"])
+def api_chat_video_stream(video_id):
+    """
+    Streaming variant of api_chat_video; same events as
+    api_chat_channel_stream.
+    """
+    data = request.json or {}
+    user_query = data.get("query", "")
+    data_type = data.get("data_type", "comprehensive_notes")  # default fallback
+
+    logger.info(f"Streaming chat-video query for video_id={video_id}, user_query={user_query}, data_type={data_type}")
+
+    session = SessionLocal()
+    try:
+        scope = chat.answer_scope(video_id=video_id)
+        fingerprint = chat.scope_fingerprint(session, data_type, video_id=video_id)
+        cached = answer_cache.lookup(scope, data_type, chat.VIDEO_CHAT_MODEL, user_query, fingerprint)
+        if cached:
+            return _chat_event_stream(None, None, cached[0])
+
+        rows = chat.retrieve_video_chunks(session, video_id, data_type, user_query,
+                                          model_name="nomic-embed-text")
+    except Exception as e:
+        logger.exception("Error while handling chat-video retrieval")
+        return jsonify({"answer": markdown.markdown(f"Error: {e}")}), 500
+    finally:
+        session.close()
+
+    return _chat_event_stream(
+        chat.VIDEO_CHAT_MODEL, chat.build_video_prompt(rows, user_query),
+        on_answer=lambda answer: answer_cache.store(
+            scope, data_type, chat.VIDEO_CHAT_MODEL, user_query, fingerprint, answer)
+    )
+
+
 
 #############################################################################
 # Admin Routes
@@ -1110,5 +1060,8 @@ def admin_add_user():
     return redirect(url_for("admin_settings"))
 
 if __name__ == '__main__':
-    # For local dev
+    # For local dev. With the reloader, only its child process serves
+    # requests, so only that one gets workers.
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        init_workers()
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+benchmark.py
+
+Summarization (and optionally chat) throughput of the whole app against a
+fake Ollama server (fake_ollama.py), so it runs on any Linux box with a
+Postgres database: no GPU, no YouTube.
+
+It starts the fake server and the app (with its embedded job workers)
+in-process, inserts BENCH_VIDEOS synthetic videos, summarizes them through
+POST /api/summarize_v2 and waits for the job. It reports videos per hour,
+Ollama calls per video and p50/p95/p99 call latency, then removes the
+synthetic rows again. With --chat it also drives the four chat endpoints
+(blocking and streaming; time to first token for the latter) for the
+channel BENCH_CHAT_CHANNEL. That channel's summaries must be vectorized,
+and pgai in Postgres must be able to reach the fake server
+(FAKE_OLLAMA_PORT, FAKE_OLLAMA_BIND).
+
+Exits non-zero if the job fails, any request errors, or a threshold is
+missed (BENCH_MIN_VIDEOS_PER_HOUR, BENCH_MAX_CALLS_PER_VIDEO), so it can
+gate CI. BENCH_MAX_CALLS_PER_VIDEO=expected derives the limit from the
+synthetic transcripts' chunk count, so it follows chunking changes.
+
+Usage:
+    python benchmark.py             # summarize benchmark
+    python benchmark.py --chat      # plus the chat endpoints
+"""
+import os
+import sys
+import json
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+# If using dotenv to load .env variables:
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass  # if python-dotenv not installed, just ensure DATABASE_URL is set externally.
+
+import fake_ollama
+from fake_ollama import percentile
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+for noisy in ("httpx", "werkzeug"):
+    logging.getLogger(noisy).setLevel(logging.WARNING)
+
+BENCH_CHANNEL = "__benchmark__"
+FINISHED = ("completed", "failed")
+
+VOCABULARY = ("model data training video channel summary topic example result "
+              "question answer people time system value idea point process "
+              "change problem number part team work talk show build learn "
+              "explain compare measure improve start finish").split()
+
+
+def synthetic_transcript(rng, words):
+    """Sentences of random vocabulary words, `words` long."""
+    sentences = []
+    remaining = words
+    while remaining > 0:
+        length = min(remaining, rng.randint(8, 20))
+        sentence = " ".join(rng.choice(VOCABULARY) for _ in range(length))
+        sentences.append(sentence.capitalize() + ".")
+        remaining -= length
+    return " ".join(sentences)
+
+
+def create_videos(SessionLocal, count, words):
+    """
+    Insert `count` synthetic videos => their ids. Transcripts differ per
+    run, so nothing is served from earlier summaries.
+    """
+    from db.models import Video
+
+    run = int(time.time())
+    rng = random.Random(run)
+    video_ids = [f"bench-{run}-{index:04d}" for index in range(count)]
+    session = SessionLocal()
+    try:
+        for video_id in video_ids:
+            session.add(Video(
+                video_id=video_id,
+                title=f"Benchmark video {video_id}",
+                upload_date="UnknownDate",
+                transcript_no_ts=synthetic_transcript(rng, words),
+            ))
+        session.commit()
+    finally:
+        session.close()
+    return video_ids
+
+
+def remove_videos(SessionLocal, video_ids):
+    from db.models import Video, VideoFolder, SummariesV2
+
+    session = SessionLocal()
+    try:
+        session.query(SummariesV2).filter(SummariesV2.video_id.in_(video_ids)).delete(synchronize_session=False)
+        session.query(VideoFolder).filter(VideoFolder.video_id.in_(video_ids)).delete(synchronize_session=False)
+        session.query(Video).filter(Video.video_id.in_(video_ids)).delete(synchronize_session=False)
+        session.commit()
+    finally:
+        session.close()
+
+
+def expected_calls_per_video(SessionLocal, video_ids, model_name, mode):
+    """
+    Ollama calls per video a correct run makes: the videos' chunks (cut
+    exactly as the summarize job cuts them, with the same tokenizer) times
+    the calls per chunk of the mode.
+    """
+    from db.models import Video
+    from summarizer_v2 import iter_transcript_chunks, PROMPT_KINDS
+
+    calls_per_chunk = 1 if mode == "structured" else len(PROMPT_KINDS)
+    session = SessionLocal()
+    try:
+        transcripts = [t for (t,) in session.query(Video.transcript_no_ts).filter(Video.video_id.in_(video_ids))]
+    finally:
+        session.close()
+    chunks = sum(sum(1 for _ in iter_transcript_chunks(model_name, transcript, mode=mode)) for transcript in transcripts)
+    return round(chunks * calls_per_chunk / len(video_ids), 2) if video_ids else 0.0
+
+
+def latency_report(latencies):
+    return {
+        "p50": _round(percentile(latencies, 50)),
+        "p95": _round(percentile(latencies, 95)),
+        "p99": _round(percentile(latencies, 99)),
+    }
+
+
+def _round(value, digits=3):
+    return round(value, digits) if value is not None else None
+
+
+def bench_summarize(base_url, fake, SessionLocal):
+    import job_queue
+    from db.models import SummariesV2
+    from summarizer_v2 import get_summarize_mode
+
+    count = int(os.getenv("BENCH_VIDEOS", "8"))
+    words = int(os.getenv("BENCH_TRANSCRIPT_WORDS", "6000"))
+    model_name = os.getenv("BENCH_MODEL", "phi4")
+    mode = get_summarize_mode(os.getenv("BENCH_MODE"))
+    video_ids = create_videos(SessionLocal, count, words)
+    try:
+        expected_calls = expected_calls_per_video(SessionLocal, video_ids, model_name, mode)
+        fake.reset()
+        payload = {"channel_name": BENCH_CHANNEL, "video_ids": video_ids, "model": model_name, "mode": mode}
+        started = time.monotonic()
+        response = requests.post(f"{base_url}/api/summarize_v2", json=payload, timeout=30)
+        response.raise_for_status()
+        job_id = int(response.json()["task_id"].rsplit("_", 1)[1])
+
+        timeout = float(os.getenv("BENCH_TIMEOUT_SECONDS", "1800"))
+        while True:
+            job = job_queue.get_jobs([job_id])[0]
+            if job["status"] in FINISHED:
+                break
+            if time.monotonic() - started > timeout:
+                raise TimeoutError(f"Summarize job {job_id} still {job['status']} after {timeout:.0f}s")
+            time.sleep(0.2)
+        elapsed = time.monotonic() - started
+
+        session = SessionLocal()
+        try:
+            summarized = session.query(SummariesV2).filter(SummariesV2.video_id.in_(video_ids)).count()
+        finally:
+            session.close()
+    finally:
+        remove_videos(SessionLocal, video_ids)
+
+    stats = fake.stats()
+    calls = sum(stats["calls"].get(endpoint, 0) for endpoint in ("chat", "generate"))
+    return {
+        "videos": count,
+        "transcript_words": words,
+        "model": model_name,
+        "mode": mode,
+        "job_status": job["status"],
+        "job_errors": job["errors"],
+        "summarized": summarized,
+        "seconds": round(elapsed, 2),
+        "videos_per_hour": round(summarized * 3600 / elapsed, 1) if elapsed else 0.0,
+        "calls_per_video": round(calls / count, 2) if count else 0.0,
+        "expected_calls_per_video": expected_calls,
+        "call_latency_seconds": latency_report(stats["latencies"]),
+        "tokens_per_second": round(stats["eval_tokens"] / elapsed, 1) if elapsed else 0.0,
+        "prompt_tokens": stats["prompt_tokens"],
+        "cached_prompt_tokens": stats["cached_prompt_tokens"],
+        "model_swaps": stats["swaps"],
+        "ollama_failures": stats["failures"],
+    }
+
+
+def chat_request(url, payload, stream):
+    """
+    One chat request => (ok, seconds, seconds to the first token or None).
+    """
+    started = time.monotonic()
+    first_token = None
+    try:
+        with requests.post(url, json=payload, stream=stream, timeout=300) as response:
+            if response.status_code != 200:
+                return False, time.monotonic() - started, None
+            if not stream:
+                response.json()
+                return True, time.monotonic() - started, None
+            ok = False
+            for line in response.iter_lines(decode_unicode=True):
+                if line == "event: token" and first_token is None:
+                    first_token = time.monotonic() - started
+                elif line == "event: done":
+                    ok = True
+                elif line == "event: error":
+                    return False, time.monotonic() - started, first_token
+            return ok, time.monotonic() - started, first_token
+    except requests.RequestException:
+        return False, time.monotonic() - started, first_token
+
+
+def bench_chat(base_url, fake, SessionLocal):
+    from db.models import VideoFolder
+
+    channel_name = os.getenv("BENCH_CHAT_CHANNEL")
+    if not channel_name:
+        raise SystemExit("--chat needs BENCH_CHAT_CHANNEL (a channel whose summaries are vectorized)")
+    session = SessionLocal()
+    try:
+        folder = session.query(VideoFolder).filter_by(folder_name=channel_name).first()
+    finally:
+        session.close()
+    if folder is None:
+        raise SystemExit(f"Channel '{channel_name}' has no videos")
+
+    total = int(os.getenv("BENCH_CHAT_REQUESTS", "20"))
+    concurrency = int(os.getenv("BENCH_CHAT_CONCURRENCY", "4"))
+    payload = {"query": "What are the main topics discussed?", "data_type": "comprehensive_notes",
+               "model_name": os.getenv("BENCH_MODEL", "phi4")}
+    endpoints = {
+        "chat_channel": (f"{base_url}/api/chat-channel/{channel_name}", False),
+        "chat_channel_stream": (f"{base_url}/api/chat-channel/{channel_name}/stream", True),
+        "chat_video": (f"{base_url}/api/chat-video/{folder.video_id}", False),
+        "chat_video_stream": (f"{base_url}/api/chat-video/{folder.video_id}/stream", True),
+    }
+
+    results = {}
+    for name, (url, stream) in endpoints.items():
+        fake.reset()
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            outcomes = list(executor.map(lambda _: chat_request(url, payload, stream), range(total)))
+        elapsed = time.monotonic() - started
+        first_tokens = [t for ok, _, t in outcomes if ok and t is not None]
+        results[name] = {
+            "requests": total,
+            "errors": sum(1 for ok, _, _ in outcomes if not ok),
+            "requests_per_second": round(total / elapsed, 2) if elapsed else 0.0,
+            "latency_seconds": latency_report([seconds for ok, seconds, _ in outcomes if ok]),
+            "first_token_seconds": latency_report(first_tokens) if stream else None,
+            "ollama_calls": fake.stats()["calls"],
+        }
+    return results
+
+
+def start_app():
+    """
+    Import the app (after OLLAMA_HOSTS points at the fake server) and serve
+    it on a free local port => (server, base URL).
+    """
+    from werkzeug.serving import make_server
+    from app import app, init_workers
+
+    init_workers()
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="benchmark-app", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def check(report):
+    """
+    Problems that should fail the run, as messages.
+    """
+    problems = []
+    summarize = report["summarize"]
+    if summarize["job_status"] != "completed" or summarize["summarized"] < summarize["videos"]:
+        problems.append(f"summarize job {summarize['job_status']}, "
+                        f"{summarize['summarized']}/{summarize['videos']} videos summarized")
+    min_rate = float(os.getenv("BENCH_MIN_VIDEOS_PER_HOUR", "0"))
+    if min_rate and summarize["videos_per_hour"] < min_rate:
+        problems.append(f"{summarize['videos_per_hour']} videos/hour < BENCH_MIN_VIDEOS_PER_HOUR={min_rate:g}")
+    max_calls = os.getenv("BENCH_MAX_CALLS_PER_VIDEO", "0")
+    if max_calls.lower() == "expected":
+        # Exactly what the chunking calls for: any extra call is a
+        # duplicate or a retry, whatever the chunk count is.
+        max_calls = summarize["expected_calls_per_video"]
+    max_calls = float(max_calls)
+    if max_calls and summarize["calls_per_video"] > max_calls:
+        problems.append(f"{summarize['calls_per_video']} calls/video > BENCH_MAX_CALLS_PER_VIDEO={max_calls:g}")
+    for name, result in (report.get("chat") or {}).items():
+        if result["errors"]:
+            problems.append(f"{name}: {result['errors']}/{result['requests']} requests failed")
+    return problems
+
+
+def main():
+    with_chat = "--chat" in sys.argv[1:]
+
+    fake_server, fake = fake_ollama.serve()
+    host, port = fake_server.server_address[:2]
+    os.environ["OLLAMA_HOSTS"] = f"{host}:{port}"
+    # Measure generation, not the persistent LLM output cache.
+    os.environ["LLM_CACHE_MODE"] = "off"
+    logger.info(f"Fake Ollama on http://{host}:{port}")
+
+    app_server, base_url = start_app()
+    from app import SessionLocal
+
+    report = {"fake_ollama": {
+        "latency": fake.latency,
+        "tokens_per_second": fake.tokens_per_second,
+        "output_tokens": fake.output_tokens,
+        "num_parallel": fake.num_parallel,
+        "failure_rate": fake.failure_rate,
+    }}
+    try:
+        report["summarize"] = bench_summarize(base_url, fake, SessionLocal)
+        if with_chat:
+            report["chat"] = bench_chat(base_url, fake, SessionLocal)
+    finally:
+        app_server.shutdown()
+        fake_server.shutdown()
+
+    print(json.dumps(report, indent=2))
+    output = os.getenv("BENCH_OUTPUT")
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    problems = check(report)
+    for problem in problems:
+        logger.error(problem)
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
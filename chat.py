@@ -0,0 +1,304 @@
+# chat.py
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+from sqlalchemy.sql import text
+
+import embedding_cache
+from ollama_scheduler import get_keep_alive, response_usage
+from ollama_pool import get_pool
+
+logger = logging.getLogger(__name__)
+
+# Retrieval and generation shared by the chat endpoints in app.py, both
+# the blocking ones (generation via ai.ollama_generate in Postgres) and
+# the streaming ones (generation via the Ollama client, token by token).
+
+EMBEDDINGS_VIEW_MAP = {
+    "comprehensive_notes": "public.summaries_v2_comprehensive_notes_embedding",
+    "concise_summary":     "public.summaries_v2_concise_summary_embedding",
+    "key_topics":          "public.summaries_v2_key_topics_embedding",
+    "important_takeaways": "public.summaries_v2_important_takeaways_embedding",
+    "transcript":          "public.videos_embedding"
+}
+
+# Model used for chat-video answers (the page has no model picker).
+VIDEO_CHAT_MODEL = "gemma2:27b"
+
+
+def embeddings_view(data_type):
+    # If the user chose something not in the map, default to comprehensive_notes
+    return EMBEDDINGS_VIEW_MAP.get(data_type, EMBEDDINGS_VIEW_MAP["comprehensive_notes"])
+
+
+# Parameter types of the retrieval statements, in PREPARE order.
+_PARAM_TYPES = {
+    "model_name": "text",
+    "query_text": "text",
+    "ollama_url": "text",
+    "query_hash": "text",
+    "normalized_query": "text",
+    "oldest": "timestamp",
+    "scope_id": "text",
+    "limit": "integer",
+}
+
+
+def _run_retrieval(session, name, sql, params):
+    """
+    Rows of sql (psycopg2 %(name)s parameters). Unless
+    CHAT_PREPARED_STATEMENTS=off (e.g. behind a transaction-mode pooler),
+    runs it as a prepared statement, created once per database connection,
+    so its plan is reused by later chats.
+    """
+    conn = session.connection()
+    if os.getenv("CHAT_PREPARED_STATEMENTS", "on").lower() == "off":
+        return conn.exec_driver_sql(sql, params).fetchall()
+    prepared = conn.info.setdefault("chat_prepared", set())
+    if name not in prepared:
+        positional = sql
+        for index, key in enumerate(_PARAM_TYPES, 1):
+            positional = positional.replace(f"%({key})s", f"${index}")
+        types = ", ".join(_PARAM_TYPES.values())
+        conn.exec_driver_sql(f"PREPARE {name} ({types}) AS {positional}")
+        prepared.add(name)
+    arguments = ", ".join(f"%({key})s" for key in _PARAM_TYPES)
+    return conn.exec_driver_sql(f"EXECUTE {name} ({arguments})", params).fetchall()
+
+
+def _embed_and_retrieve(session, scope, data_type, query, model_name, scope_id, limit, select_sql):
+    """
+    Embed query and search the data_type view in one statement: the query
+    vector (from the embedding cache, else ai.ollama_embed) stays inside
+    Postgres. select_sql is the search over the view `ev`, joined with q.
+    """
+    cached = embedding_cache.is_enabled()
+    view_key = data_type if data_type in EMBEDDINGS_VIEW_MAP else "comprehensive_notes"
+    name = f"chat_{scope}_{view_key}_{'cached' if cached else 'uncached'}"
+    sql = (f"WITH {embedding_cache.query_embedding_cte(cached)}\n"
+           + select_sql.format(view=embeddings_view(data_type)))
+    params = {
+        **embedding_cache.query_embedding_params(model_name, query, get_pool().url_for(model_name)),
+        "scope_id": scope_id,
+        "limit": limit,
+    }
+    rows = _run_retrieval(session, name, sql, params)
+    if cached:
+        session.commit()  # the cache row (new, or its last_used)
+        if rows and rows[0].fresh:
+            embedding_cache.record_store()
+    return rows
+
+
+def retrieve_channel_chunks(session, channel_name, data_type, query, limit=5,
+                            model_name="nomic-embed-text:latest"):
+    """
+    Top chunks for a channel by similarity to query: rows of
+    (chunk, video_id, video_title, similarity).
+    """
+    rows = _embed_and_retrieve(session, "channel", data_type, query, model_name, channel_name, limit, """
+        SELECT
+            ev.chunk,
+            ev.video_id,
+            v.title AS video_title,
+            1 - (ev.embedding <=> q.emb) AS similarity,
+            q.fresh
+        FROM q
+        CROSS JOIN {view} ev
+        JOIN video_folders vf ON ev.video_id = vf.video_id
+        JOIN videos v        ON ev.video_id = v.video_id
+        WHERE vf.folder_name = %(scope_id)s
+        ORDER BY similarity DESC
+        LIMIT %(limit)s
+    """)
+    return [tuple(row[:4]) for row in rows]
+
+
+def retrieve_video_chunks(session, video_id, data_type, query, limit=5,
+                          model_name="nomic-embed-text:latest"):
+    """
+    Top chunks of one video by similarity to query: rows of
+    (chunk, similarity).
+    """
+    rows = _embed_and_retrieve(session, "video", data_type, query, model_name, video_id, limit, """
+        SELECT ev.chunk,
+               1 - (ev.embedding <=> q.emb) AS similarity,
+               q.fresh
+          FROM q
+         CROSS JOIN {view} ev
+         WHERE ev.video_id = %(scope_id)s
+         ORDER BY similarity DESC
+         LIMIT %(limit)s
+    """)
+    return [tuple(row[:2]) for row in rows]
+
+
+def answer_scope(channel_name=None, video_id=None):
+    """
+    Answer cache scope of a chat: "channel:<name>" or "video:<id>".
+    """
+    return f"channel:{channel_name}" if channel_name is not None else f"video:{video_id}"
+
+
+# Recently computed fingerprints: (scope, data_type) -> (fingerprint,
+# expiry). The aggregates behind a fingerprint scan the whole channel, so
+# they run at most once per CHAT_FINGERPRINT_TTL_SECONDS per scope and
+# process; content changes show up in cached answers within that time.
+FINGERPRINT_CACHE_SIZE = 1024
+_fingerprints = OrderedDict()
+_fingerprints_lock = threading.Lock()
+
+
+def scope_fingerprint(session, data_type, channel_name=None, video_id=None):
+    """
+    Hash of the state of a channel's (or one video's) chat content: its
+    videos, its SummariesV2 rows, and the embedded chunks of the data_type
+    view (re-embedding replaces chunk uuids). Answers cached under another
+    fingerprint are stale (see answer_cache.py). Reused for
+    CHAT_FINGERPRINT_TTL_SECONDS (0 = computed on every request).
+    """
+    ttl = float(os.getenv("CHAT_FINGERPRINT_TTL_SECONDS", "60"))
+    key = (answer_scope(channel_name, video_id), data_type)
+    if ttl > 0:
+        with _fingerprints_lock:
+            cached = _fingerprints.get(key)
+        if cached and cached[1] > time.monotonic():
+            return cached[0]
+
+    fingerprint = _compute_scope_fingerprint(session, data_type, channel_name, video_id)
+    if ttl > 0:
+        with _fingerprints_lock:
+            _fingerprints[key] = (fingerprint, time.monotonic() + ttl)
+            _fingerprints.move_to_end(key)
+            while len(_fingerprints) > FINGERPRINT_CACHE_SIZE:
+                _fingerprints.popitem(last=False)
+    return fingerprint
+
+
+def _compute_scope_fingerprint(session, data_type, channel_name=None, video_id=None):
+    if channel_name is not None:
+        def scoped(alias):
+            return (f"JOIN video_folders vf ON vf.video_id = {alias}.video_id "
+                    f"WHERE vf.folder_name = :scope_id")
+        scope_id = channel_name
+    else:
+        def scoped(alias):
+            return f"WHERE {alias}.video_id = :scope_id"
+        scope_id = video_id
+    row = session.execute(text(f"""
+        SELECT
+            (SELECT count(*) || ':' || coalesce(max(v.last_modified)::text, '')
+               FROM videos v {scoped("v")}),
+            (SELECT count(*) || ':' || coalesce(max(s.id), 0) || ':' || coalesce(max(s.date_generated)::text, '')
+               FROM summaries_v2 s {scoped("s")}),
+            (SELECT count(*) || ':' || coalesce(max(ev.embedding_uuid::text), '')
+               FROM {embeddings_view(data_type)} ev {scoped("ev")})
+    """), {"scope_id": scope_id}).one()
+    return hashlib.sha256("|".join(row).encode("utf-8")).hexdigest()
+
+
+def build_channel_prompt(chunk_rows, user_query):
+    """
+    => (prompt, { video_id: title } of the videos the chunks came from)
+    """
+    context_pieces = []
+    unique_videos = {}
+    for chunk_text, chunk_vid_id, chunk_vid_title, similarity in chunk_rows:
+        context_pieces.append(f"Chunk (similarity={similarity:.4f}): {chunk_text}")
+        unique_videos[chunk_vid_id] = chunk_vid_title
+
+    context_for_generation = "\n\n".join(context_pieces)
+    prompt_str = f"""
+Context:
+{context_for_generation}
+
+User Query:
+{user_query}
+
+Please provide a concise answer:
+"""
+    return prompt_str, unique_videos
+
+
+def build_video_prompt(chunk_rows, user_query):
+    context = "\n\n".join([f"Chunk: {r[0]}" for r in chunk_rows])
+    return f"Query: {user_query}\nContext:\n{context}"
+
+
+def generate_answer(session, model_name, prompt):
+    """
+    Complete answer via ai.ollama_generate (runs inside Postgres) on a
+    backend from the Ollama pool, taking its turn in that backend's
+    scheduler.
+    """
+    result_json = get_pool().run(model_name, lambda backend: session.execute(text("""
+        SELECT ai.ollama_generate(
+            :model_name,
+            :prompt,
+            :ollama_url,
+            keep_alive => :keep_alive
+        ) AS answer
+    """), {
+        "model_name": model_name,
+        "prompt": prompt,
+        "ollama_url": backend.url,
+        "keep_alive": get_keep_alive(model_name)
+    }).scalar(), interactive=True)
+    if not result_json:
+        return None
+    return result_json.get("response", "[No response in JSON]")
+
+
+def stream_answer(model_name, prompt):
+    """
+    Yield the answer piece by piece as Ollama generates it. Holds the
+    model's scheduler slot on the chosen backend until the stream ends (or
+    the client goes away and the generator is closed).
+    """
+    with get_pool().slot(model_name, interactive=True) as (backend, usage):
+        for part in backend.client.generate(
+            model=model_name,
+            prompt=prompt,
+            stream=True,
+            keep_alive=get_keep_alive(model_name)
+        ):
+            if part.get("response"):
+                yield part["response"]
+            if part.get("done"):
+                usage.update(response_usage(part))
+
+
+def used_videos_html(unique_videos):
+    """
+    The "Videos used in Context" list appended to channel answers.
+    """
+    if not unique_videos:
+        return ""
+    html = "<h4>Videos used in Context:</h4>\n<ul>\n"
+    for vid_id, vid_title in unique_videos.items():
+        html += f"""
+<li>
+    <a href="https://www.youtube.com/watch?v={vid_id}" target="_blank">
+        <svg style="fill:#333; height:1em; width:1em;" version="1.1"
+             xmlns="http://www.w3.org/2000/svg"
+             xmlns:xlink="http://www.w3.org/1999/xlink"
+             viewBox="0 0 48 48" xml:space="preserve">
+            <use href="#icon-summarizeYouTube" xlink:href="#icon-summarizeYouTube"></use>
+        </svg>
+    </a>
+    &nbsp;
+    <a href="/chat-video/{vid_id}">
+        <svg xmlns="http://www.w3.org/2000/svg" height="24px"
+             viewBox="0 -960 960 960" width="24px">
+            <path d="M240-400h320v-80H240v80Zm0-120h480v-80H240v80Zm0-120h480v-80H240v80ZM80-80v-720q0-33 23.5-56.5T160-880h640q33 0 56.5 23.5T880-800v480q0 33-23.5 56.5T800-240H240L80-80Zm126-240h594v-480H160v525l46-45Zm-46 0v-480 480Z"/>
+        </svg>
+    </a>
+    {vid_title}
+</li>
+"""
+    html += "</ul>\n"
+    return html
@@ -0,0 +1,75 @@
+# db/cache_table.py
+import os
+import threading
+from datetime import datetime
+
+from sqlalchemy import select, delete, func
+
+from db.models import Base
+
+# Shared plumbing of the cache tables (llm_cache, embedding_cache,
+# answer_cache): each has created_at / last_used columns, is created on
+# first use, and is pruned every <PREFIX>_PRUNE_EVERY stores.
+
+
+class CacheTable:
+    """
+    One cache table: creates it on first use and counts stores towards the
+    next prune (every `prune_every_env` stores, default 200).
+    """
+    def __init__(self, engine, model, prune_every_env):
+        self.engine = engine
+        self.model = model
+        self.prune_every_env = prune_every_env
+        self._ready = False
+        self._stores_since_prune = 0
+        self._lock = threading.Lock()
+
+    def ensure(self):
+        if not self._ready:
+            Base.metadata.create_all(self.engine, tables=[self.model.__table__])
+            self._ready = True
+
+    def record_store(self):
+        """
+        Count one store => True when the table is due for pruning.
+        """
+        with self._lock:
+            self._stores_since_prune += 1
+            if self._stores_since_prune < int(os.getenv(self.prune_every_env, "200")):
+                return False
+            self._stores_since_prune = 0
+            return True
+
+
+def prune_expired(session, model, ttl):
+    """
+    Delete rows created more than `ttl` (a timedelta, or None = keep) ago.
+    Returns the number of rows deleted.
+    """
+    if not ttl:
+        return 0
+    return session.execute(
+        delete(model).where(model.created_at < datetime.utcnow() - ttl)
+    ).rowcount
+
+
+def prune_lru(session, model, ttl, max_rows):
+    """
+    prune_expired, then the least recently used rows beyond max_rows
+    (0 = unbounded). Only 90% of max_rows is kept, so pruning isn't re-run
+    on every store. Returns the number of rows deleted; the caller commits.
+    """
+    deleted = prune_expired(session, model, ttl)
+    if max_rows > 0:
+        total = session.execute(select(func.count()).select_from(model)).scalar()
+        if total > max_rows:
+            cutoff = (
+                select(model.last_used)
+                .order_by(model.last_used.desc())
+                .offset(int(max_rows * 0.9))
+                .limit(1)
+                .scalar_subquery()
+            )
+            deleted += session.execute(delete(model).where(model.last_used <= cutoff)).rowcount
+    return deleted
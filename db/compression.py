@@ -0,0 +1,44 @@
+# db/compression.py
+import os
+
+from sqlalchemy.types import TypeDecorator, LargeBinary
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None  # values are stored uncompressed
+
+# Every zstd frame starts with this magic number, so compressed and
+# uncompressed (legacy, or written without zstandard installed) values can
+# live side by side in the same column.
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+def compress(data):
+    if not data or zstandard is None:
+        return data
+    level = int(os.getenv("ZSTD_LEVEL", "3"))
+    return zstandard.ZstdCompressor(level=level).compress(data)
+
+
+def decompress(data):
+    if not data or not data.startswith(ZSTD_MAGIC):
+        return data
+    if zstandard is None:
+        raise RuntimeError("zstandard is required to read compressed column data")
+    return zstandard.ZstdDecompressor().decompress(data)
+
+
+class ZstdBinary(TypeDecorator):
+    """
+    BYTEA column that is zstd-compressed on write and transparently
+    decompressed on read.
+    """
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return compress(value)
+
+    def process_result_value(self, value, dialect):
+        return decompress(bytes(value)) if value is not None else None
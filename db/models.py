@@ -1,8 +1,12 @@
 # sync_service/models.py
 import datetime
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import relationship, deferred
+
+from db.compression import ZstdBinary
+from db.transcript_segments import format_with_ts
 
 Base = declarative_base()
 
@@ -13,8 +17,11 @@ class Video(Base):
     # Newly added columns:
     title = Column(String(512))              # e.g. video title
     upload_date = Column(String(32))         # e.g. "2023-12-01" or "UnknownDate"    
-    transcript_with_ts = Column(Text)
-    transcript_no_ts = Column(Text)
+    # Large columns are deferred: listing queries never read them, and the whole
+    # "transcript" group is loaded together on first access (or via undefer_group).
+    transcript_with_ts = deferred(Column(Text), group="transcript")   # legacy rows only; new rows derive it from transcript_segments
+    transcript_no_ts = deferred(Column(Text), group="transcript")     # segment text, newline-joined
+    transcript_segments = deferred(Column(ZstdBinary), group="transcript")  # packed timing (zstd), see db/transcript_segments.py
     tokens_with_ts = Column(Integer, default=0)
     tokens_no_ts = Column(Integer, default=0)
     last_modified = Column(DateTime, default=datetime.datetime.utcnow)
@@ -24,6 +31,18 @@ class Video(Base):
     # The new V2 Summaries relationship:
     summaries_v2 = relationship("SummariesV2", back_populates="video")
 
+    @property
+    def timestamped_transcript(self):
+        """
+        The "[start - duration] text" transcript, derived from the packed
+        segments (or the stored legacy column for rows not yet compacted).
+        """
+        if self.transcript_with_ts:
+            return self.transcript_with_ts
+        if self.transcript_segments:
+            return format_with_ts(self.transcript_segments, self.transcript_no_ts or "")
+        return ""
+
 class VideoFolder(Base):
     __tablename__ = "video_folders"
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -34,6 +53,23 @@ class VideoFolder(Base):
 
     video = relationship("Video", back_populates="folders")
 
+    # One link per (playlist, video) so ingestion can batch-insert links
+    # with ON CONFLICT DO NOTHING.
+    __table_args__ = (
+        Index("uq_video_folders_playlist_video", "original_playlist_id", "video_id", unique=True),
+    )
+
+
+
+class PlaylistSyncState(Base):
+    __tablename__ = "playlist_sync_state"
+    # The immutable YouTube playlist/channel id (matches VideoFolder.original_playlist_id)
+    playlist_id = Column(String(255), primary_key=True)
+    # Newest video already ingested; incremental refreshes stop listing here
+    newest_video_id = Column(String(50))
+    last_synced = Column(DateTime, default=datetime.datetime.utcnow)
+    last_full_sync = Column(DateTime)
+
 
 
 # The NEW Summaries v2 table (without the old columns),
@@ -45,21 +81,74 @@ class SummariesV2(Base):
     video_title = Column(String(512))
     model_name = Column(String(50))      # e.g. "phi4"
     date_generated = Column(DateTime, default=datetime.datetime.utcnow)
-    concise_summary = Column(Text)            # new
-    key_topics = Column(Text)                 # new
-    important_takeaways = Column(Text)        # new
-    comprehensive_notes = Column(Text)        # new
+    # Deferred like the Video transcripts; loaded as one "summary" group.
+    concise_summary = deferred(Column(Text), group="summary")            # new
+    key_topics = deferred(Column(Text), group="summary")                 # new
+    important_takeaways = deferred(Column(Text), group="summary")        # new
+    comprehensive_notes = deferred(Column(Text), group="summary")        # new
 
     video = relationship("Video", back_populates="summaries_v2")    
 
+    # One summary per (video, model): concurrent jobs for the same pair are
+    # coalesced (see jobs.run_summarize_job); this is the last line of defence.
+    __table_args__ = (
+        Index("uq_summaries_v2_video_model", "video_id", "model_name", unique=True),
+    )
+
+class LLMChunkCache(Base):
+    __tablename__ = "llm_chunk_cache"
+    # One generated output per (model, prompt template, chunk text); see llm_cache.py
+    model_name = Column(String(100), primary_key=True)
+    template_hash = Column(String(64), primary_key=True)   # sha256 of the prompt template
+    chunk_hash = Column(String(64), primary_key=True)      # sha256 of the chunk text
+    output = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    last_used = Column(DateTime, default=datetime.datetime.utcnow, index=True)
+
+class QueryEmbeddingCache(Base):
+    __tablename__ = "query_embedding_cache"
+    # One embedding per (model, normalized chat query); see embedding_cache.py
+    model_name = Column(String(100), primary_key=True)
+    query_hash = Column(String(64), primary_key=True)      # sha256 of the normalized query
+    query_text = Column(Text, nullable=False)
+    embedding = Column(Text, nullable=False)               # pgvector text form, "[0.1,0.2,...]"
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    last_used = Column(DateTime, default=datetime.datetime.utcnow, index=True)
+
+class ChatAnswerCache(Base):
+    __tablename__ = "chat_answer_cache"
+    # One answer per (scope, data type, model, normalized question); see answer_cache.py
+    key_hash = Column(String(64), primary_key=True)        # sha256 of the whole key
+    scope = Column(String(300), nullable=False)            # "channel:<name>" or "video:<id>"
+    data_type = Column(String(50))
+    model_name = Column(String(100))
+    query_text = Column(Text, nullable=False)              # normalized question
+    fingerprint = Column(String(64), nullable=False)       # state of the scope's content when answered
+    answer = Column(Text, nullable=False)                  # markdown, before rendering
+    sources = Column(JSONB)                                # { video_id: title } used as context
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    last_used = Column(DateTime, default=datetime.datetime.utcnow, index=True)
+
 class SyncJob(Base):
+    # Durable job queue for downloads and summaries (see job_queue.py)
     __tablename__ = "sync_jobs"
     id = Column(Integer, primary_key=True, autoincrement=True)
-    start_time = Column(DateTime, default=datetime.datetime.utcnow)
+    job_type = Column(String(50))        # "download" or "summarize"
+    payload = Column(JSONB)              # handler arguments
+    progress = Column(JSONB)             # last reported status dict (processed, total, errors, ...)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    start_time = Column(DateTime)        # set when a worker claims the job
     end_time = Column(DateTime)
-    status = Column(String(50), default="in_progress") # in_progress, completed, failed
+    status = Column(String(50), default="queued") # queued, in_progress, paused, completed, failed
+    claimed_by = Column(String(255))     # worker id holding the job
+    heartbeat_at = Column(DateTime)      # refreshed while the job runs; stale jobs are re-queued
+    attempts = Column(Integer, default=0)
     message = Column(Text)
 
+    __table_args__ = (
+        Index("ix_sync_jobs_status_id", "status", "id"),
+    )
+
 class User(Base):
     __tablename__ = "users"
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -0,0 +1,100 @@
+# db/transcript_segments.py
+import re
+import struct
+
+# Compact transcript storage.
+#
+# The segment text is stored once, newline-joined, in videos.transcript_no_ts
+# (which the vectorizer and summarizer already read). The timing lives in
+# videos.transcript_segments as a small binary blob:
+#
+#   b"TSG1" | count | starts[count] | durations[count] | ends[count]
+#
+# all little-endian uint32. Starts and durations are in milliseconds; ends are
+# each segment's end offset (in characters) into transcript_no_ts, so segment
+# text may itself contain newlines. The timestamped variant
+# ("[0.00s - 2.30s] Some text" per line) is derived from these on demand.
+
+MAGIC = b"TSG1"
+
+# "[12.34s - 5.67s] text" lines, as produced by build_transcript_variants
+_TS_LINE = re.compile(r"^\[(\d+(?:\.\d+)?)s - (-?\d+(?:\.\d+)?)s\] ?(.*)$")
+
+
+def pack_segments(entries):
+    """
+    [ {"text", "start", "duration"}, ... ] => (blob, text)
+    where text is the newline-joined segment text for transcript_no_ts.
+    """
+    texts = [entry["text"] for entry in entries]
+    count = len(texts)
+    starts = [max(0, round(entry["start"] * 1000)) for entry in entries]
+    durations = [max(0, round(entry["duration"] * 1000)) for entry in entries]
+    ends = []
+    pos = 0
+    for t in texts:
+        pos += len(t)
+        ends.append(pos)
+        pos += 1  # newline separator
+    blob = MAGIC + struct.pack(f"<I{count}I{count}I{count}I", count, *starts, *durations, *ends)
+    return blob, "\n".join(texts)
+
+
+def iter_segments(blob, text):
+    """
+    Lazily yield {"text", "start", "duration"} for each packed segment.
+    """
+    if not blob or not blob.startswith(MAGIC):
+        raise ValueError("Not a packed transcript segment blob")
+    (count,) = struct.unpack_from("<I", blob, len(MAGIC))
+    values = struct.unpack_from(f"<{3 * count}I", blob, len(MAGIC) + 4)
+    starts, durations, ends = values[:count], values[count:2 * count], values[2 * count:]
+
+    begin = 0
+    for start, duration, end in zip(starts, durations, ends):
+        yield {
+            "text": text[begin:end],
+            "start": start / 1000.0,
+            "duration": duration / 1000.0
+        }
+        begin = end + 1
+
+
+def unpack_segments(blob, text):
+    """
+    Inverse of pack_segments => [ {"text", "start", "duration"}, ... ]
+    """
+    return list(iter_segments(blob, text))
+
+
+def format_with_ts(blob, text):
+    """
+    Derive the "[start - duration] text" variant from packed segments.
+    """
+    return "\n".join(
+        f"[{seg['start']:.2f}s - {seg['duration']:.2f}s] {seg['text']}"
+        for seg in unpack_segments(blob, text)
+    )
+
+
+def segments_from_with_ts(transcript_with_ts):
+    """
+    Parse a legacy transcript_with_ts string back into segments.
+    Lines that don't start with a timestamp continue the previous segment's
+    text (segment text can contain newlines). Returns None if the text
+    doesn't look like a timestamped transcript.
+    """
+    segments = []
+    for line in transcript_with_ts.split("\n"):
+        match = _TS_LINE.match(line)
+        if match:
+            segments.append({
+                "text": match.group(3),
+                "start": float(match.group(1)),
+                "duration": float(match.group(2))
+            })
+        elif segments:
+            segments[-1]["text"] += "\n" + line
+        else:
+            return None
+    return segments
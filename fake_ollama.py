@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+"""
+fake_ollama.py
+
+A stand-in Ollama server for benchmarks and local runs without a GPU.
+Speaks the parts of the Ollama API the app uses: /api/chat and
+/api/generate (streamed or not, including structured "format" replies),
+/api/embed and /api/embeddings, /api/tags, /api/ps, /api/show and
+/api/version. Replies are filler text (embeddings are deterministic per
+input), timed like a GPU box:
+
+- every call costs FAKE_OLLAMA_LATENCY seconds of overhead, plus its prompt
+  at FAKE_OLLAMA_PREFILL_TOKENS_PER_SECOND (a prefix shared with a recent
+  prompt is "cached" and free), plus FAKE_OLLAMA_OUTPUT_TOKENS generated at
+  FAKE_OLLAMA_TOKENS_PER_SECOND;
+- at most FAKE_OLLAMA_NUM_PARALLEL calls run at once, for one model at a
+  time; switching models waits for running calls and costs
+  FAKE_OLLAMA_LOAD_SECONDS;
+- FAKE_OLLAMA_FAILURE_RATE of the calls fail with HTTP 500.
+
+Counters and per-call latencies are at GET /fake/stats (POST /fake/reset
+clears them); benchmark.py starts one in-process.
+
+Usage:
+    python fake_ollama.py            # listens on FAKE_OLLAMA_PORT
+    OLLAMA_HOSTS=localhost:11435 python app.py
+"""
+import os
+import json
+import time
+import math
+import random
+import hashlib
+import logging
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# If using dotenv to load .env variables:
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+FILLER_WORDS = ("the model summarizes this part of the transcript with a few "
+                "plain words about topics takeaways and notes").split()
+
+
+def _env_float(name, default):
+    return float(os.getenv(name, default))
+
+
+def _tokens(text):
+    # ~4 characters per token, like token_utils.estimate_tokens
+    return (len(text) + 3) // 4
+
+
+def _common_prefix(a, b):
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of values (None if empty)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class FakeOllama:
+    """
+    The simulated GPU box: settings, the slot/model state and counters.
+    """
+    def __init__(self, **settings):
+        def setting(name, default):
+            return settings.get(name, _env_float(f"FAKE_OLLAMA_{name.upper()}", default))
+
+        self.latency = setting("latency", "0.05")
+        self.tokens_per_second = setting("tokens_per_second", "400")
+        self.prefill_tokens_per_second = setting("prefill_tokens_per_second", "20000")
+        self.output_tokens = int(setting("output_tokens", "200"))
+        self.failure_rate = setting("failure_rate", "0")
+        self.num_parallel = max(1, int(setting("num_parallel", "4")))
+        self.load_seconds = setting("load_seconds", "2")
+        self.context_length = int(setting("context_length", "8192"))
+        self.embed_dim = int(setting("embed_dim", "768"))
+        models = settings.get("models") or os.getenv(
+            "FAKE_OLLAMA_MODELS", "phi4:latest,gemma2:27b,nomic-embed-text:latest")
+        if isinstance(models, str):
+            models = models.split(",")
+        self.models = [m.strip() if ":" in m else f"{m.strip()}:latest" for m in models if m.strip()]
+        self._random = random.Random(int(setting("seed", "0")))
+
+        self._cond = threading.Condition()
+        self._loaded = None
+        self._active = 0
+        self._recent_prompts = []     # prompt cache, one entry per slot
+        self.reset()
+
+    def reset(self):
+        with self._cond:
+            self.calls = {}            # endpoint -> count
+            self.failures = 0
+            self.swaps = 0
+            self.latencies = []        # seconds per generation call, queueing included
+            self.prompt_tokens = 0
+            self.cached_prompt_tokens = 0
+            self.eval_tokens = 0
+            self.started = time.monotonic()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "calls": dict(self.calls),
+                "failures": self.failures,
+                "swaps": self.swaps,
+                "prompt_tokens": self.prompt_tokens,
+                "cached_prompt_tokens": self.cached_prompt_tokens,
+                "eval_tokens": self.eval_tokens,
+                "latency_p50": percentile(self.latencies, 50),
+                "latency_p95": percentile(self.latencies, 95),
+                "latency_p99": percentile(self.latencies, 99),
+                "latencies": list(self.latencies),
+                "loaded_model": self._loaded,
+                "uptime_seconds": time.monotonic() - self.started,
+            }
+
+    @property
+    def loaded_model(self):
+        return self._loaded
+
+    def full_name(self, model_name):
+        model_name = model_name or ""
+        return model_name if ":" in model_name else f"{model_name}:latest"
+
+    def should_fail(self):
+        with self._cond:
+            return self._random.random() < self.failure_rate
+
+    def count(self, endpoint, failed=False):
+        with self._cond:
+            self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+            if failed:
+                self.failures += 1
+
+    def acquire(self, model_name):
+        """
+        Wait for a slot running model_name (swapping models when idle).
+        Returns the load time spent, in seconds.
+        """
+        with self._cond:
+            while not (self._active < self.num_parallel
+                       and (self._loaded == model_name or self._active == 0)):
+                self._cond.wait()
+            swapping = self._loaded != model_name
+            if swapping:
+                if self._loaded is not None:
+                    self.swaps += 1
+                self._loaded = model_name
+                self._recent_prompts = []
+            self._active += 1
+        if swapping:
+            time.sleep(self.load_seconds)
+            return self.load_seconds
+        return 0.0
+
+    def release(self):
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+
+    def prefill(self, prompt):
+        """
+        (prompt tokens to evaluate, seconds): tokens in the longest prefix
+        shared with a recent prompt count as cached.
+        """
+        with self._cond:
+            cached = max((_common_prefix(prompt, p) for p in self._recent_prompts), default=0)
+            self._recent_prompts = (self._recent_prompts + [prompt])[-self.num_parallel:]
+            evaluated = max(1, _tokens(prompt) - _tokens(prompt[:cached]))
+            self.prompt_tokens += evaluated
+            self.cached_prompt_tokens += _tokens(prompt) - evaluated
+        return evaluated, evaluated / self.prefill_tokens_per_second
+
+    def record(self, seconds, eval_tokens):
+        with self._cond:
+            self.latencies.append(seconds)
+            self.eval_tokens += eval_tokens
+
+    def filler(self, count):
+        return " ".join(FILLER_WORDS[i % len(FILLER_WORDS)] for i in range(count))
+
+    def embedding(self, text):
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+        rng = random.Random(seed)
+        vector = [rng.gauss(0, 1) for _ in range(self.embed_dim)]
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+
+def structured_reply(schema, text):
+    """
+    A JSON reply for a "format" request: every string property of the
+    schema filled with text (or an empty object for format="json").
+    """
+    properties = schema.get("properties", {}) if isinstance(schema, dict) else {}
+    return json.dumps({field: text for field in properties})
+
+
+def make_handler(fake):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+        def _send_json(self, obj, status=200):
+            body = json.dumps(obj).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _read_json(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(length) or b"{}") if length else {}
+
+        def do_GET(self):
+            if self.path == "/api/version":
+                self._send_json({"version": "0.0.0-fake"})
+            elif self.path == "/api/tags":
+                self._send_json({"models": [
+                    {"name": m, "model": m, "modified_at": _now(), "size": 0,
+                     "digest": hashlib.sha256(m.encode()).hexdigest(), "details": {}}
+                    for m in fake.models
+                ]})
+            elif self.path == "/api/ps":
+                loaded = [fake.loaded_model] if fake.loaded_model else []
+                self._send_json({"models": [
+                    {"name": m, "model": m, "size": 0, "digest": "", "details": {},
+                     "expires_at": _now(), "size_vram": 0}
+                    for m in loaded
+                ]})
+            elif self.path == "/fake/stats":
+                self._send_json(fake.stats())
+            else:
+                self._send_json({"error": "not found"}, 404)
+
+        def do_POST(self):
+            try:
+                body = self._read_json()
+            except ValueError:
+                self._send_json({"error": "invalid JSON"}, 400)
+                return
+            if self.path == "/fake/reset":
+                fake.reset()
+                self._send_json({})
+                return
+            if self.path not in ("/api/show", "/api/chat", "/api/generate", "/api/embed", "/api/embeddings"):
+                self._send_json({"error": "not found"}, 404)
+                return
+
+            model_name = fake.full_name(body.get("model") or body.get("name"))
+            if model_name not in fake.models:
+                self._send_json({"error": f"model '{body.get('model')}' not found"}, 404)
+                return
+            if self.path == "/api/show":
+                self._send_json({
+                    "modelfile": "", "parameters": "", "template": "{{ .Prompt }}",
+                    "details": {"family": "fake"},
+                    "model_info": {"general.architecture": "fake",
+                                   "fake.context_length": fake.context_length},
+                })
+                return
+
+            endpoint = self.path.rsplit("/", 1)[-1]
+            if fake.should_fail():
+                fake.count(endpoint, failed=True)
+                self._send_json({"error": "fake_ollama: simulated failure"}, 500)
+                return
+            fake.count(endpoint)
+            if endpoint in ("embed", "embeddings"):
+                self._embed(model_name, body, endpoint)
+            else:
+                self._generate(model_name, body, endpoint)
+
+        def _embed(self, model_name, body, endpoint):
+            started = time.monotonic()
+            inputs = body.get("input", body.get("prompt", ""))
+            if isinstance(inputs, str):
+                inputs = [inputs]
+            fake.acquire(model_name)
+            try:
+                tokens = sum(_tokens(text) for text in inputs)
+                time.sleep(fake.latency + tokens / fake.prefill_tokens_per_second)
+            finally:
+                fake.release()
+            fake.record(time.monotonic() - started, 0)
+            vectors = [fake.embedding(text) for text in inputs]
+            if endpoint == "embeddings":
+                self._send_json({"embedding": vectors[0]})
+            else:
+                self._send_json({"model": model_name, "embeddings": vectors,
+                                 "prompt_eval_count": tokens})
+
+        def _generate(self, model_name, body, endpoint):
+            started = time.monotonic()
+            if endpoint == "chat":
+                prompt = "\n".join(str(m.get("content", "")) for m in body.get("messages", []))
+            else:
+                prompt = body.get("prompt", "")
+            stream = body.get("stream", True)
+            output_tokens = int((body.get("options") or {}).get("num_predict") or fake.output_tokens)
+            if body.get("format"):
+                text = structured_reply(body["format"], fake.filler(max(1, output_tokens // 4)))
+            else:
+                text = fake.filler(output_tokens)
+            pieces = text.split(" ")
+
+            load_seconds = fake.acquire(model_name)
+            try:
+                prompt_tokens, prefill_seconds = fake.prefill(prompt)
+                time.sleep(fake.latency + prefill_seconds)
+                if stream:
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/x-ndjson")
+                    self.send_header("Transfer-Encoding", "chunked")
+                    self.end_headers()
+                    for index, piece in enumerate(pieces):
+                        time.sleep(1 / fake.tokens_per_second)
+                        self._write_chunk(_part(endpoint, model_name, piece if index == 0 else f" {piece}"))
+                else:
+                    time.sleep(output_tokens / fake.tokens_per_second)
+            finally:
+                fake.release()
+
+            final = {
+                **_part(endpoint, model_name, "" if stream else text),
+                "done": True,
+                "done_reason": "stop",
+                "total_duration": int((time.monotonic() - started) * 1e9),
+                "load_duration": int(load_seconds * 1e9),
+                "prompt_eval_count": prompt_tokens,
+                "prompt_eval_duration": int(prefill_seconds * 1e9),
+                "eval_count": output_tokens,
+                "eval_duration": int(output_tokens / fake.tokens_per_second * 1e9),
+            }
+            fake.record(time.monotonic() - started, output_tokens)
+            if stream:
+                self._write_chunk(final)
+                self.wfile.write(b"0\r\n\r\n")
+            else:
+                self._send_json(final)
+
+        def _write_chunk(self, obj):
+            data = json.dumps(obj).encode("utf-8") + b"\n"
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _part(endpoint, model_name, text):
+    part = {"model": model_name, "created_at": _now(), "done": False}
+    if endpoint == "chat":
+        part["message"] = {"role": "assistant", "content": text}
+    else:
+        part["response"] = text
+    return part
+
+
+def serve(port=None, host=None, **settings):
+    """
+    Start a fake server in a background thread => (server, fake). Port 0
+    picks a free port (server.server_address[1]).
+    """
+    if port is None:
+        port = int(os.getenv("FAKE_OLLAMA_PORT", "11435"))
+    fake = FakeOllama(**settings)
+    server = ThreadingHTTPServer((host or os.getenv("FAKE_OLLAMA_BIND", "127.0.0.1"), port), make_handler(fake))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-ollama", daemon=True).start()
+    return server, fake
+
+
+def main():
+    server, fake = serve()
+    host, port = server.server_address[:2]
+    logger.info(f"Fake Ollama on http://{host}:{port} with {', '.join(fake.models)} "
+                f"({fake.tokens_per_second:g} tok/s, {fake.num_parallel} parallel, "
+                f"{fake.failure_rate:.0%} failures)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+# ollama_pool.py
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, TimeoutError, wait
+
+import httpx
+import ollama
+
+from ollama_scheduler import OllamaScheduler
+
+logger = logging.getLogger(__name__)
+
+# Pool of Ollama backends (OLLAMA_HOSTS, else REMOTE_OLLAMA_HOST).
+#
+# Each backend keeps one ollama.Client (a pooled keep-alive HTTP
+# connection) and its own model-affinity scheduler. Calls are routed to
+# the healthy backend with the lowest load (calls running or queued there),
+# counting a backend that doesn't have the model loaded as
+# OLLAMA_SWAP_PENALTY calls busier, so work sticks to warm models. A
+# background thread checks every backend every OLLAMA_HEALTH_INTERVAL
+# seconds (/api/ps: is it up, what is loaded) and refreshes its model list
+# every OLLAMA_MODELS_TTL seconds; a backend that fails a connection is
+# skipped until it passes a check again, and the call is retried once on
+# another backend.
+#
+# Optionally (OLLAMA_HEDGE_AFTER_SECONDS > 0) a summary call that hasn't
+# finished after that long is sent to a second backend as well and the
+# first answer wins. The slower request is not cancelled, so this trades
+# GPU time for tail latency; it is off by default.
+
+DEFAULT_PORT = 11434
+
+
+def configured_urls():
+    """
+    Base URLs of the configured backends: OLLAMA_HOSTS
+    ("gpu1,gpu2:11435,http://gpu3:11434"), else REMOTE_OLLAMA_HOST.
+    """
+    hosts = os.getenv("OLLAMA_HOSTS") or os.getenv("REMOTE_OLLAMA_HOST") or "localhost"
+    urls = []
+    for host in hosts.split(","):
+        host = host.strip().rstrip("/")
+        if not host:
+            continue
+        if "://" not in host:
+            host = f"http://{host}"
+        if host.count(":") < 2:
+            host = f"{host}:{DEFAULT_PORT}"
+        urls.append(host)
+    return urls
+
+
+def _full_name(model_name):
+    # Ollama lists "phi4" as "phi4:latest".
+    return model_name if ":" in model_name else f"{model_name}:latest"
+
+
+def _is_backend_failure(exc):
+    """
+    True if exc means the backend itself is unreachable or broken (as
+    opposed to e.g. "model not found").
+    """
+    if isinstance(exc, (httpx.TransportError, ConnectionError)):
+        return True
+    return isinstance(exc, ollama.ResponseError) and exc.status_code >= 500
+
+
+class Backend:
+    def __init__(self, url):
+        self.url = url
+        self.client = ollama.Client(host=url)
+        self._probe = ollama.Client(host=url, timeout=float(os.getenv("OLLAMA_HEALTH_TIMEOUT", "5")))
+        self.scheduler = OllamaScheduler()
+        self.healthy = True           # optimistic until the first check
+        self.last_error = None
+        self.checked_at = None
+        self.loaded = set()           # models Ollama reports as loaded (/api/ps)
+        self.models = None            # available models (/api/tags); None = unknown yet
+        self.models_at = 0.0
+        self.latency = None           # EWMA of call duration, seconds
+        self._lock = threading.Lock()
+
+    def has_model(self, model_name):
+        return self.models is None or not model_name or _full_name(model_name) in self.models
+
+    def is_warm(self, model_name):
+        loaded = self.scheduler.loaded_model
+        return (_full_name(model_name) in self.loaded
+                or (loaded is not None and _full_name(loaded) == _full_name(model_name)))
+
+    def observe(self, seconds):
+        with self._lock:
+            self.latency = seconds if self.latency is None else 0.8 * self.latency + 0.2 * seconds
+
+    def mark_down(self, exc):
+        if self.healthy:
+            logger.warning(f"Ollama backend {self.url} marked unhealthy: {exc}")
+        self.healthy = False
+        self.last_error = str(exc)
+
+    def check(self, refresh_models=False):
+        """
+        Health check: /api/ps (and /api/tags when refresh_models).
+        """
+        try:
+            self.loaded = {m.model for m in self._probe.ps().models}
+            if refresh_models or self.models is None:
+                self.models = {m.model for m in self._probe.list().models}
+                self.models_at = time.monotonic()
+        except Exception as e:
+            self.mark_down(e)
+        else:
+            if not self.healthy:
+                logger.info(f"Ollama backend {self.url} is healthy again")
+            self.healthy = True
+            self.last_error = None
+        finally:
+            self.checked_at = time.time()
+
+
+class OllamaPool:
+    def __init__(self, urls):
+        self.backends = [Backend(url) for url in urls]
+        self.failovers = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._hedge_executor = None
+        self._lock = threading.Lock()
+        self._checker = None
+
+    def start_health_checks(self):
+        with self._lock:
+            if self._checker is None:
+                self._checker = threading.Thread(target=self._health_loop, name="ollama-health", daemon=True)
+                self._checker.start()
+
+    def _health_loop(self):
+        while True:
+            ttl = float(os.getenv("OLLAMA_MODELS_TTL", "300"))
+            for backend in self.backends:
+                backend.check(refresh_models=time.monotonic() - backend.models_at >= ttl)
+            time.sleep(float(os.getenv("OLLAMA_HEALTH_INTERVAL", "15")))
+
+    def pick(self, model_name=None, exclude=()):
+        """
+        Backend for a call to model_name: healthy, has the model, lowest
+        load (with the swap penalty for cold models), then fastest.
+        Falls back to unhealthy backends if nothing else is left.
+        """
+        penalty = float(os.getenv("OLLAMA_SWAP_PENALTY", "4"))
+        candidates = [b for b in self.backends if b not in exclude]
+        if not candidates:
+            return None
+        usable = ([b for b in candidates if b.healthy and b.has_model(model_name)]
+                  or [b for b in candidates if b.healthy]
+                  or candidates)
+
+        def score(backend):
+            cold = 0 if not model_name or backend.is_warm(model_name) else penalty
+            return (backend.scheduler.load() + cold, backend.latency or 0.0)
+
+        return min(usable, key=score)
+
+    def url_for(self, model_name=None):
+        """
+        Base URL of the backend to send an unscheduled call to (e.g. the
+        pgai embedding queries).
+        """
+        return self.pick(model_name).url
+
+    def run(self, model_name, fn, interactive=False, hedge=False):
+        """
+        Return fn(backend) run on a picked backend, in its scheduler. A
+        backend failure is retried once on another backend. With hedge=True
+        and OLLAMA_HEDGE_AFTER_SECONDS set, a slow call is duplicated onto a
+        second backend and the first result is returned.
+        """
+        hedge_after = float(os.getenv("OLLAMA_HEDGE_AFTER_SECONDS", "0"))
+        backend = self.pick(model_name)
+        if not hedge or hedge_after <= 0 or len(self.backends) < 2:
+            return self._run_with_failover(backend, model_name, fn, interactive)
+
+        executor = self._get_hedge_executor()
+        first = executor.submit(self._run_with_failover, backend, model_name, fn, interactive)
+        try:
+            return first.result(timeout=hedge_after)
+        except TimeoutError:
+            pass
+        second_backend = self.pick(model_name, exclude=(backend,))
+        if second_backend is None or not second_backend.healthy:
+            return first.result()
+        self.hedges += 1
+        logger.info(f"Hedging slow {model_name} call: {backend.url} -> also {second_backend.url}")
+        second = executor.submit(self._run_on, second_backend, model_name, fn, interactive)
+        pending = {first, second}
+        while True:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            succeeded = [future for future in done if future.exception() is None]
+            if succeeded or not pending:
+                winner = succeeded[0] if succeeded else done.pop()
+                if winner is second and succeeded:
+                    self.hedge_wins += 1
+                return winner.result()
+
+    def _get_hedge_executor(self):
+        with self._lock:
+            if self._hedge_executor is None:
+                self._hedge_executor = ThreadPoolExecutor(
+                    max_workers=int(os.getenv("OLLAMA_HEDGE_THREADS", "32")),
+                    thread_name_prefix="ollama-hedge"
+                )
+            return self._hedge_executor
+
+    def _run_with_failover(self, backend, model_name, fn, interactive):
+        try:
+            return self._run_on(backend, model_name, fn, interactive)
+        except Exception as e:
+            if not _is_backend_failure(e):
+                raise
+            other = self.pick(model_name, exclude=(backend,))
+            if other is None or not other.healthy:
+                raise
+            self.failovers += 1
+            logger.warning(f"Retrying {model_name} call on {other.url} after {backend.url} failed: {e}")
+            return self._run_on(other, model_name, fn, interactive)
+
+    def _run_on(self, backend, model_name, fn, interactive):
+        def call():
+            started = time.monotonic()
+            try:
+                result = fn(backend)
+            except Exception as e:
+                if _is_backend_failure(e):
+                    backend.mark_down(e)
+                raise
+            backend.observe(time.monotonic() - started)
+            return result
+
+        return backend.scheduler.run(model_name, call, interactive)
+
+    @contextmanager
+    def slot(self, model_name, interactive=False):
+        """
+        Hold a turn for model_name on a picked backend for the duration of
+        the with-block (streamed responses). Yields (backend, usage); see
+        OllamaScheduler.slot. No failover once output may have been sent.
+        """
+        backend = self.pick(model_name)
+        with backend.scheduler.slot(model_name, interactive) as usage:
+            try:
+                yield backend, usage
+            except Exception as e:
+                if _is_backend_failure(e):
+                    backend.mark_down(e)
+                raise
+
+    def list_models(self):
+        """
+        Names of the models available on any healthy backend, from the
+        cached lists (refreshed in the background every OLLAMA_MODELS_TTL).
+        Only the very first call waits for the backends.
+        """
+        for backend in self.backends:
+            if backend.models is None:
+                backend.check(refresh_models=True)
+        names = set()
+        for backend in self.backends:
+            if backend.healthy and backend.models:
+                names |= backend.models
+        return sorted(names)
+
+    def stats(self):
+        backends = []
+        for backend in self.backends:
+            backends.append({
+                "url": backend.url,
+                "healthy": backend.healthy,
+                "last_error": backend.last_error,
+                "checked_at": backend.checked_at,
+                "latency_seconds": round(backend.latency, 2) if backend.latency is not None else None,
+                "load": backend.scheduler.load(),
+                "loaded_models": sorted(backend.loaded),
+                "models": len(backend.models or ()),
+                "scheduler": backend.scheduler.stats(),
+            })
+        return {
+            "backends": backends,
+            "swaps": sum(b["scheduler"]["swaps"] for b in backends),
+            "failovers": self.failovers,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+        }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    The process-wide pool, created (and its health checks started) on
+    first use so .env has been loaded by then.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = OllamaPool(configured_urls())
+            logger.info(f"Ollama backends: {', '.join(b.url for b in _pool.backends)}")
+            _pool.start_health_checks()
+        return _pool
@@ -0,0 +1,272 @@
+# ollama_scheduler.py
+import os
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Model-affinity scheduler in front of an Ollama host.
+#
+# Summaries and chat may ask for different models; interleaving them on
+# one Ollama server makes it evict and reload gigabytes of weights for
+# every other request. Every generation call therefore goes through its
+# backend's scheduler (see ollama_pool.py): calls are queued per model, the
+# loaded model's backlog is drained before another model is started, and
+# a switch only happens once in-flight calls of the old model have
+# finished. To avoid starving anyone, the loaded model stops taking new
+# calls once another model's oldest call has waited OLLAMA_MAX_WAIT_SECONDS
+# (OLLAMA_INTERACTIVE_MAX_WAIT_SECONDS for chat).
+#
+# Schedulers are per process: the web app (with its embedded workers)
+# and each run_worker.py process schedule their own calls.
+
+
+def get_model_setting(name, model_name, default):
+    """
+    Per-model value of env setting `name`: either a single value for every
+    model ("2") or per-model overrides with an optional default
+    ("phi4=4,gemma2:27b=1,*=2"). Returns a string.
+    """
+    value = default
+    for part in os.getenv(name, default).split(","):
+        key, sep, setting = part.strip().rpartition("=")
+        if not setting:
+            continue
+        if not sep or key == "*":
+            value = setting
+        elif key == model_name:
+            return setting
+    return value
+
+
+def get_model_concurrency(model_name):
+    """
+    How many requests may be in flight to one model at a time, from
+    OLLAMA_MODEL_CONCURRENCY (see get_model_setting). 1 means strictly
+    sequential.
+    """
+    try:
+        return max(1, int(get_model_setting("OLLAMA_MODEL_CONCURRENCY", model_name, "2")))
+    except ValueError:
+        return 1
+
+
+def get_keep_alive(model_name):
+    """
+    How long Ollama should keep model_name loaded after a call
+    (OLLAMA_KEEP_ALIVE, per-model like OLLAMA_MODEL_CONCURRENCY), e.g.
+    "30m" for the summarization model, "5m" for a rarely used chat model.
+    """
+    return get_model_setting("OLLAMA_KEEP_ALIVE", model_name, "30m")
+
+
+class _Ticket:
+    __slots__ = ("model", "interactive", "queued_at")
+
+    def __init__(self, model, interactive):
+        self.model = model
+        self.interactive = interactive
+        self.queued_at = time.monotonic()
+
+
+class OllamaScheduler:
+    """
+    Runs calls for one model at a time (up to its concurrency), draining
+    that model's queue before switching; see the module comment.
+    """
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._waiting = {}       # model -> deque of _Ticket, FIFO (chat first)
+        self._loaded = None      # model the scheduler last ran
+        self._active = 0         # in-flight calls, all for self._loaded
+        self._stats = {}
+        self._swaps = 0
+        self._started = time.monotonic()
+
+    @property
+    def loaded_model(self):
+        return self._loaded
+
+    def load(self):
+        """
+        Calls running or waiting, for least-loaded routing.
+        """
+        with self._cond:
+            return self._active + sum(len(queue) for queue in self._waiting.values())
+
+    def run(self, model_name, call, interactive=False):
+        """
+        Wait for model_name's turn, then return call(). Interactive
+        (chat) calls go ahead of queued batch calls for the same model and
+        have a shorter wait bound before they force a switch.
+        """
+        with self.slot(model_name, interactive) as usage:
+            result = call()
+            usage.update(response_usage(result))
+            return result
+
+    @contextmanager
+    def slot(self, model_name, interactive=False):
+        """
+        Hold model_name's turn for the duration of the with-block (e.g. a
+        streamed response). Yields a dict; update it with
+        response_usage(final response) to count generated tokens and prompt
+        processing in the stats.
+        """
+        ticket = _Ticket(model_name, interactive)
+        with self._cond:
+            queue = self._waiting.setdefault(model_name, deque())
+            if interactive:
+                position = sum(1 for t in queue if t.interactive)
+                queue.insert(position, ticket)
+            else:
+                queue.append(ticket)
+            self._model_stats(model_name)["requests"] += 1
+            while not self._may_start(ticket):
+                # Timed wait: max-wait deadlines pass without a notify.
+                self._cond.wait(timeout=1.0)
+            queue.popleft()
+            if self._loaded != model_name:
+                if self._loaded is not None:
+                    self._swaps += 1
+                    logger.info(f"Ollama scheduler: switching {self._loaded} -> {model_name} "
+                                f"({len(queue) + 1} queued)")
+                self._loaded = model_name
+                self._model_stats(model_name)["loads"] += 1
+            self._active += 1
+            waited = time.monotonic() - ticket.queued_at
+            # The next ticket in line may be able to start too.
+            self._cond.notify_all()
+
+        started = time.monotonic()
+        failed = True
+        usage = response_usage(None)
+        try:
+            yield usage
+            failed = False
+        finally:
+            with self._cond:
+                self._active -= 1
+                stats = self._model_stats(model_name)
+                stats["failed" if failed else "completed"] += 1
+                stats["wait_seconds"] += waited
+                stats["busy_seconds"] += time.monotonic() - started
+                for key, value in usage.items():
+                    stats[key] += value
+                self._cond.notify_all()
+
+    def _may_start(self, ticket):
+        model = ticket.model
+        if self._waiting[model][0] is not ticket:
+            return False
+        if self._loaded == model:
+            return self._active < get_model_concurrency(model) and self._overdue_model() is None
+        return self._active == 0 and self._next_model() == model
+
+    def _max_wait(self, ticket):
+        if ticket.interactive:
+            return float(os.getenv("OLLAMA_INTERACTIVE_MAX_WAIT_SECONDS", "15"))
+        return float(os.getenv("OLLAMA_MAX_WAIT_SECONDS", "120"))
+
+    def _overdue_model(self):
+        """
+        The unloaded model whose head call has waited past its bound the
+        longest, or None.
+        """
+        now = time.monotonic()
+        overdue = None
+        for model, queue in self._waiting.items():
+            if model == self._loaded or not queue:
+                continue
+            head = queue[0]
+            if now - head.queued_at < self._max_wait(head):
+                continue
+            if overdue is None or head.queued_at < overdue[1]:
+                overdue = (model, head.queued_at)
+        return overdue[0] if overdue else None
+
+    def _next_model(self):
+        """
+        Model to run once the loaded one is idle: the loaded model while it
+        has a backlog (unless another model is overdue), else the model
+        with waiting chat calls, else the one waiting longest.
+        """
+        overdue = self._overdue_model()
+        if overdue:
+            return overdue
+        if self._waiting.get(self._loaded):
+            return self._loaded
+        candidates = [(model, queue[0]) for model, queue in self._waiting.items() if queue]
+        if not candidates:
+            return None
+        model, _ = min(candidates, key=lambda c: (not c[1].interactive, c[1].queued_at))
+        return model
+
+    def _model_stats(self, model_name):
+        stats = self._stats.get(model_name)
+        if stats is None:
+            stats = {"requests": 0, "completed": 0, "failed": 0, "loads": 0,
+                     "wait_seconds": 0.0, "busy_seconds": 0.0, **response_usage(None)}
+            self._stats[model_name] = stats
+        return stats
+
+    def stats(self):
+        """
+        Snapshot for /api/ollama/scheduler: the loaded model, swap count,
+        and per model its queue, throughput, average wait and prompt
+        processing (prefill) time per prompt.
+        """
+        with self._cond:
+            uptime = time.monotonic() - self._started
+            models = {}
+            for model, stats in self._stats.items():
+                finished = stats["completed"] + stats["failed"]
+                models[model] = {
+                    **{k: round(v, 2) if isinstance(v, float) else v for k, v in stats.items()},
+                    "queued": len(self._waiting.get(model) or ()),
+                    "active": self._active if model == self._loaded else 0,
+                    "avg_wait_seconds": round(stats["wait_seconds"] / finished, 2) if finished else 0.0,
+                    "calls_per_minute": round(finished * 60 / uptime, 2) if uptime else 0.0,
+                    "tokens_per_second": (round(stats["eval_tokens"] / stats["busy_seconds"], 2)
+                                          if stats["busy_seconds"] else 0.0),
+                    "avg_prefill_seconds": (round(stats["prefill_seconds"] / stats["prompts"], 3)
+                                            if stats["prompts"] else 0.0),
+                    "prefill_tokens_per_second": (round(stats["prompt_tokens"] / stats["prefill_seconds"], 2)
+                                                  if stats["prefill_seconds"] else 0.0),
+                    "concurrency": get_model_concurrency(model),
+                    "keep_alive": get_keep_alive(model),
+                }
+            return {
+                "loaded_model": self._loaded,
+                "swaps": self._swaps,
+                "uptime_seconds": round(uptime, 1),
+                "models": models,
+            }
+
+
+def response_usage(result):
+    """
+    Counters from an Ollama response (chat/generate response, final
+    stream part or ai.ollama_generate JSON), or from a list of them:
+    generated tokens, prompt tokens evaluated, prefill time and the number
+    of prompts. Prompt tokens served from Ollama's prompt cache are not
+    evaluated, so a prefix reused between prompts shows up as fewer
+    prompt tokens and less prefill time. Missing fields count as 0.
+    """
+    usage = {"eval_tokens": 0, "prompt_tokens": 0, "prefill_seconds": 0.0, "prompts": 0}
+    if result is None:
+        return usage
+    for response in result if isinstance(result, (list, tuple)) else (result,):
+        try:
+            usage["eval_tokens"] += int(response.get("eval_count") or 0)
+            usage["prompt_tokens"] += int(response.get("prompt_eval_count") or 0)
+            duration = response.get("prompt_eval_duration")
+        except Exception:
+            continue
+        if duration is not None:
+            usage["prefill_seconds"] += duration / 1e9  # nanoseconds
+            usage["prompts"] += 1
+    return usage
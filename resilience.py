@@ -0,0 +1,229 @@
+# resilience.py
+import os
+import random
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Errors that say "this video has no transcript" rather than "try again later".
+_PERMANENT_ERROR_NAMES = {
+    "NoTranscriptFound", "TranscriptsDisabled", "NoTranscriptAvailable",
+    "VideoUnavailable", "InvalidVideoId", "NotTranslatable",
+    "TranslationLanguageNotAvailable", "TranscriptCacheMiss",
+}
+
+_TRANSIENT_ERROR_NAMES = {
+    "TooManyRequests", "YouTubeRequestFailed", "ConnectionError",
+    "Timeout", "ReadTimeout", "ConnectTimeout", "TimeoutError",
+    "RemoteDisconnected", "IncompleteRead", "URLError",
+}
+
+_RATE_LIMIT_MARKERS = ("HTTP Error 429", "429 Client Error", "Too Many Requests")
+
+_TRANSIENT_MARKERS = _RATE_LIMIT_MARKERS + (
+    "HTTP Error 5", "Server Error", "timed out",
+    "Connection reset", "Temporary failure", "Remote end closed",
+)
+
+
+def is_rate_limited(exc):
+    """
+    True if exc looks like YouTube throttling us (HTTP 429 / captcha page).
+    """
+    if type(exc).__name__ == "TooManyRequests":
+        return True
+    if getattr(getattr(exc, "response", None), "status_code", None) == 429:
+        return True
+    if getattr(exc, "code", None) == 429:
+        return True
+    message = str(exc)
+    return any(marker in message for marker in _RATE_LIMIT_MARKERS)
+
+
+def is_transient(exc):
+    """
+    Classify a fetch error: True if retrying later may succeed
+    (throttling, 5xx, network trouble), False if it is a property of the
+    video itself (no captions, private, removed, ...).
+    """
+    name = type(exc).__name__
+    if name in _PERMANENT_ERROR_NAMES:
+        return False
+    if name in _TRANSIENT_ERROR_NAMES or is_rate_limited(exc):
+        return True
+    status = getattr(getattr(exc, "response", None), "status_code", None) or getattr(exc, "code", None)
+    if isinstance(status, int) and status >= 500:
+        return True
+    message = str(exc)
+    return any(marker in message for marker in _TRANSIENT_MARKERS)
+
+
+def backoff_delay(attempt, base=None, cap=None):
+    """
+    "Full jitter" exponential backoff: a random delay in
+    [0, min(cap, base * 2**attempt)] seconds, so retries from many workers
+    don't land on YouTube at the same moment.
+    """
+    if base is None:
+        base = float(os.getenv("FETCH_BACKOFF_BASE", "2"))
+    if cap is None:
+        cap = float(os.getenv("FETCH_BACKOFF_MAX", "120"))
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def retry_call(fn, *args, retries=None, description=None, **kwargs):
+    """
+    Call fn(*args, **kwargs), retrying transient failures (see is_transient)
+    with jittered exponential backoff. Permanent failures, and the last
+    transient one, are re-raised.
+    """
+    if retries is None:
+        retries = int(os.getenv("FETCH_MAX_RETRIES", "4"))
+    attempt = 0
+    while True:
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if attempt >= retries or not is_transient(e):
+                raise
+            delay = backoff_delay(attempt)
+            attempt += 1
+            logger.warning(f"{description or getattr(fn, '__name__', 'call')} failed ({e}); "
+                           f"retry {attempt}/{retries} in {delay:.1f}s")
+            time.sleep(delay)
+
+
+class CircuitBreaker:
+    """
+    Tracks the outcome of the last `window` calls. Once at least `min_calls`
+    have been seen and the share of transient failures reaches
+    `error_rate`, the circuit opens: wait() then blocks every caller for
+    `cooldown` seconds, pausing the whole job instead of spending requests
+    that would fail too. Each consecutive trip doubles the cooldown (up to
+    8x); a successful call resets it.
+    """
+    def __init__(self, error_rate=None, window=None, min_calls=None, cooldown=None,
+                 on_open=None, on_close=None):
+        self.error_rate = error_rate if error_rate is not None else float(os.getenv("CIRCUIT_ERROR_RATE", "0.5"))
+        self.min_calls = min_calls if min_calls is not None else int(os.getenv("CIRCUIT_MIN_CALLS", "10"))
+        window = window if window is not None else int(os.getenv("CIRCUIT_WINDOW", "20"))
+        self.cooldown = cooldown if cooldown is not None else float(os.getenv("CIRCUIT_COOLDOWN", "60"))
+        self.on_open = on_open
+        self.on_close = on_close
+        self._outcomes = deque(maxlen=max(1, window))
+        self._lock = threading.Lock()
+        self._open_until = 0.0
+        self._trips = 0
+
+    def is_open(self):
+        return time.monotonic() < self._open_until
+
+    def wait(self):
+        """Block while the circuit is open."""
+        while True:
+            with self._lock:
+                remaining = self._open_until - time.monotonic()
+                if remaining <= 0:
+                    if self._open_until:
+                        # Half-open: let calls through on a fresh window.
+                        self._open_until = 0.0
+                        self._outcomes.clear()
+                        if self.on_close:
+                            self.on_close()
+                    return
+            time.sleep(min(remaining, 1.0))
+
+    def record(self, failed):
+        with self._lock:
+            self._outcomes.append(bool(failed))
+            if not failed:
+                self._trips = 0
+                return
+            if self._open_until or len(self._outcomes) < self.min_calls:
+                return
+            failures = sum(self._outcomes)
+            if failures / len(self._outcomes) < self.error_rate:
+                return
+            cooldown = self.cooldown * min(8, 2 ** self._trips)
+            self._trips += 1
+            self._open_until = time.monotonic() + cooldown
+            logger.warning(f"Circuit opened: {failures}/{len(self._outcomes)} recent fetches "
+                           f"failed; pausing for {cooldown:.0f}s")
+            if self.on_open:
+                self.on_open(cooldown)
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD limit on concurrent calls: each throttled (429) response halves
+    the limit, every `limit` successes raise it by one again, up to
+    max_limit. Used as a context manager around each call.
+    """
+    def __init__(self, max_limit, min_limit=1):
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.limit = self.max_limit
+        self._active = 0
+        self._successes = 0
+        self._cond = threading.Condition()
+
+    def __enter__(self):
+        with self._cond:
+            while self._active >= self.limit:
+                self._cond.wait()
+            self._active += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+        return False
+
+    def on_success(self):
+        with self._cond:
+            self._successes += 1
+            if self._successes >= self.limit and self.limit < self.max_limit:
+                self._successes = 0
+                self.limit += 1
+                self._cond.notify_all()
+
+    def on_throttle(self):
+        with self._cond:
+            new_limit = max(self.min_limit, self.limit // 2)
+            if new_limit < self.limit:
+                logger.warning(f"Throttled by YouTube; concurrency {self.limit} -> {new_limit}")
+            self.limit = new_limit
+            self._successes = 0
+
+
+class FetchGuard:
+    """
+    Wraps every outbound YouTube call of a job: waits out an open circuit,
+    takes an adaptive concurrency slot and a rate limiter slot, then
+    records the outcome. Only transient errors count against the circuit;
+    "this video has no captions" is not a sign of throttling.
+    """
+    def __init__(self, concurrency, rate_limiter=None, breaker=None):
+        self.rate_limiter = rate_limiter
+        self.breaker = breaker or CircuitBreaker()
+        self.concurrency = AdaptiveConcurrency(concurrency)
+
+    def call(self, fn, *args, **kwargs):
+        self.breaker.wait()
+        with self.concurrency:
+            if self.rate_limiter:
+                self.rate_limiter.wait()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                if is_rate_limited(e):
+                    self.concurrency.on_throttle()
+                self.breaker.record(failed=is_transient(e))
+                raise
+        self.concurrency.on_success()
+        self.breaker.record(failed=False)
+        return result
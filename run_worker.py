@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+run_worker.py
+
+Standalone job worker: pulls download and summarize jobs from the
+Postgres-backed queue (see job_queue.py) and runs them. Start as many as
+you like, on any host that can reach the database; each claims jobs with
+SKIP LOCKED, so throughput scales with the number of workers.
+
+Usage:
+    python run_worker.py                 # WORKER_THREADS workers, all job types
+    python run_worker.py summarize       # only summarize jobs
+"""
+import os
+import sys
+import signal
+import logging
+import threading
+
+# If using dotenv to load .env variables:
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass  # if python-dotenv not installed, just ensure DATABASE_URL is set externally.
+
+from job_queue import Worker
+from jobs import HANDLERS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    job_types = sys.argv[1:] or list(HANDLERS)
+    unknown = [t for t in job_types if t not in HANDLERS]
+    if unknown:
+        logger.error(f"Unknown job type(s): {', '.join(unknown)}")
+        sys.exit(1)
+
+    stop_event = threading.Event()
+
+    def stop(signum, frame):
+        logger.info("Stopping after the current job(s)...")
+        stop_event.set()
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    threads = []
+    for index in range(max(1, int(os.getenv("WORKER_THREADS", "2")))):
+        worker = Worker(HANDLERS, job_types=job_types)
+        thread = threading.Thread(target=worker.run, args=(stop_event,), name=f"job-worker-{index}")
+        thread.start()
+        threads.append(thread)
+
+    while any(thread.is_alive() for thread in threads):
+        for thread in threads:
+            thread.join(timeout=1)
+
+
+if __name__ == "__main__":
+    main()
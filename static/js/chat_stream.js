@@ -0,0 +1,67 @@
+// Streams a chat answer from one of the /api/chat-*/stream endpoints into
+// chatDiv: tokens appear as the model generates them, then the final
+// answer (rendered markdown plus source videos) replaces the raw text.
+async function streamChat(url, payload, chatDiv) {
+  const resp = await fetch(url, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify(payload)
+  });
+
+  const contentType = resp.headers.get("Content-Type") || "";
+  if (!contentType.startsWith("text/event-stream")) {
+    // Retrieval failed before streaming started: a plain JSON answer
+    const data = await resp.json();
+    showAnswer(chatDiv, data.answer);
+    return;
+  }
+
+  chatDiv.innerHTML = `
+    <div class="prose dark:prose-invert max-w-none">
+      <div class="text-gray-900 dark:text-gray-100 whitespace-pre-wrap" id="streamingAnswer"></div>
+    </div>
+  `;
+  const answerDiv = chatDiv.querySelector("#streamingAnswer");
+
+  const reader = resp.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    // SSE events are separated by a blank line
+    let boundary;
+    while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+      const rawEvent = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+
+      let eventName = "message";
+      let data = "";
+      rawEvent.split("\n").forEach(line => {
+        if (line.startsWith("event: ")) eventName = line.slice(7);
+        else if (line.startsWith("data: ")) data += line.slice(6);
+      });
+      if (!data) continue;
+      const payload = JSON.parse(data);
+
+      if (eventName === "token") {
+        answerDiv.textContent += payload.text;
+      } else if (eventName === "done" || eventName === "error") {
+        showAnswer(chatDiv, payload.answer);
+      }
+    }
+  }
+}
+
+function showAnswer(chatDiv, answerHtml) {
+  chatDiv.innerHTML = `
+    <div class="prose dark:prose-invert max-w-none">
+      <div class="text-gray-900 dark:text-gray-100">
+        ${answerHtml}
+      </div>
+    </div>
+  `;
+}
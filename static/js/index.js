@@ -241,15 +241,20 @@ document.addEventListener("DOMContentLoaded", () => {
   function handleRefreshClick(event) {
     const channelName = event.currentTarget.dataset.channel;
     if (!channelName) return;
+    // Shift+click forces a full relist instead of only checking for new uploads
+    const full = event.shiftKey;
     
-    if (!confirm(`Refresh channel "${channelName}" to check for new videos?`)) {
+    const prompt = full
+      ? `Fully relist channel "${channelName}"? This re-checks every video.`
+      : `Refresh channel "${channelName}" to check for new videos?`;
+    if (!confirm(prompt)) {
       return;
     }
     console.log('refreshing channel', channelName);
     fetch("/api/channels/refresh", {
       method: "POST",
       headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ channel_name: channelName })
+      body: JSON.stringify({ channel_name: channelName, full: full })
     })
     .then(response => response.json())
     .then(data => {
@@ -1,41 +1,64 @@
 document.addEventListener("DOMContentLoaded", () => {
   const statusResult = document.getElementById("statusResult");
   let previousData = null;
+  let tasks = [];
 
   function getStatusColor(status) {
     switch (status.toLowerCase()) {
       case 'completed':
         return 'text-green-500 dark:text-green-400';
       case 'in progress':
+      case 'in_progress':
         return 'text-blue-500 dark:text-blue-400';
       case 'failed':
         return 'text-red-500 dark:text-red-400';
       case 'pending':
+      case 'queued':
+      case 'paused':
         return 'text-yellow-500 dark:text-yellow-400';
       default:
         return 'text-gray-500 dark:text-gray-400';
     }
   }
 
-  function getProgressBar(processed, total) {
-    const percentage = total > 0 ? (processed / total) * 100 : 0;
+  function formatDuration(seconds) {
+    if (seconds < 60) return `${Math.round(seconds)}s`;
+    const minutes = Math.floor(seconds / 60);
+    if (minutes < 60) return `${minutes}m ${Math.round(seconds % 60)}s`;
+    return `${Math.floor(minutes / 60)}h ${minutes % 60}m`;
+  }
+
+  function getProgressBar(task) {
+    // Summaries report chunk-level progress; downloads count videos.
+    const byChunks = task.chunks_total > 0;
+    const processed = byChunks ? task.chunks_done : task.processed;
+    const total = byChunks ? task.chunks_total : task.total;
+    const percentage = total > 0 ? Math.min(100, (processed / total) * 100) : 0;
     const width = `${percentage}%`;
-    
+
+    const details = [byChunks ? `${task.processed} / ${task.total} videos` : `${processed} / ${total}`];
+    if (byChunks) details.push(`${processed} / ${total} chunks`);
+    if (task.tokens_per_second) details.push(`${task.tokens_per_second} tok/s`);
+    if (task.eta_seconds != null) details.push(`ETA ${formatDuration(task.eta_seconds)}`);
+
     return `
       <div class="w-full bg-gray-200 dark:bg-gray-700 rounded-full h-2.5">
         <div class="bg-blue-500 h-2.5 rounded-full" style="width: ${width}"></div>
       </div>
       <div class="text-xs text-gray-500 dark:text-gray-400 mt-1">
-        ${processed} / ${total}
+        ${details.join(" · ")}
       </div>
     `;
   }
 
-  async function fetchAllTasks() {
-    try {
-      const res = await fetch("/api/all-tasks");
-      const data = await res.json();
+  function getErrors(task) {
+    if (!task.errors || !task.errors.length) return '-';
+    const hidden = (task.error_count || 0) - task.errors.length;
+    return task.errors.join(", ") + (hidden > 0 ? ` (+${hidden} more)` : '');
+  }
 
+  function renderTasks(data) {
+    try {
       // If no data, show empty state
       if (!data || data.length === 0) {
         statusResult.innerHTML = `
@@ -80,11 +103,11 @@ document.addEventListener("DOMContentLoaded", () => {
             </td>
             <td class="px-6 py-4 whitespace-nowrap">
               <div class="w-48">
-                ${getProgressBar(task.processed, task.total)}
+                ${getProgressBar(task)}
               </div>
             </td>
             <td class="px-6 py-4 text-sm text-red-500 dark:text-red-400">
-              ${task.errors.length ? task.errors.join(", ") : '-'}
+              ${getErrors(task)}
             </td>
           </tr>
         `;
@@ -113,34 +136,76 @@ document.addEventListener("DOMContentLoaded", () => {
       }
 
       statusResult.innerHTML = tableHTML;
-      previousData = data;
+      previousData = data.slice();
 
     } catch (err) {
-      statusResult.innerHTML = `
-        <div class="rounded-md bg-red-50 dark:bg-red-900/50 p-4">
-          <div class="flex">
-            <div class="flex-shrink-0">
-              <svg class="h-5 w-5 text-red-400" viewBox="0 0 20 20" fill="currentColor">
-                <path fill-rule="evenodd" d="M10 18a8 8 0 100-16 8 8 0 000 16zM8.707 7.293a1 1 0 00-1.414 1.414L8.586 10l-1.293 1.293a1 1 0 101.414 1.414L10 11.414l1.293 1.293a1 1 0 001.414-1.414L11.414 10l1.293-1.293a1 1 0 00-1.414-1.414L10 8.586 8.707 7.293z" clip-rule="evenodd"/>
-              </svg>
-            </div>
-            <div class="ml-3">
-              <h3 class="text-sm font-medium text-red-800 dark:text-red-200">
-                Error fetching tasks
-              </h3>
-              <div class="mt-2 text-sm text-red-700 dark:text-red-300">
-                ${err.toString()}
-              </div>
+      showError(err);
+    }
+  }
+
+  function showError(err) {
+    statusResult.innerHTML = `
+      <div class="rounded-md bg-red-50 dark:bg-red-900/50 p-4">
+        <div class="flex">
+          <div class="flex-shrink-0">
+            <svg class="h-5 w-5 text-red-400" viewBox="0 0 20 20" fill="currentColor">
+              <path fill-rule="evenodd" d="M10 18a8 8 0 100-16 8 8 0 000 16zM8.707 7.293a1 1 0 00-1.414 1.414L8.586 10l-1.293 1.293a1 1 0 101.414 1.414L10 11.414l1.293 1.293a1 1 0 001.414-1.414L11.414 10l1.293-1.293a1 1 0 00-1.414-1.414L10 8.586 8.707 7.293z" clip-rule="evenodd"/>
+            </svg>
+          </div>
+          <div class="ml-3">
+            <h3 class="text-sm font-medium text-red-800 dark:text-red-200">
+              Error fetching tasks
+            </h3>
+            <div class="mt-2 text-sm text-red-700 dark:text-red-300">
+              ${err.toString()}
             </div>
           </div>
         </div>
-      `;
+      </div>
+    `;
+  }
+
+  async function fetchAllTasks() {
+    try {
+      const res = await fetch("/api/all-tasks");
+      tasks = await res.json();
+      renderTasks(tasks);
+    } catch (err) {
+      showError(err);
     }
   }
 
-  // Initial fetch
-  fetchAllTasks();
+  function applyDelta(delta) {
+    const task = tasks.find(t => t.task_id === delta.task_id);
+    if (task) {
+      Object.assign(task, delta);
+    } else {
+      tasks.unshift(delta);  // new job: the delta carries every field
+    }
+    renderTasks(tasks);
+  }
 
-  // Refresh every 5 seconds
-  setInterval(fetchAllTasks, 5000);
+  if (!window.EventSource) {
+    // No SSE support: fall back to polling every 5 seconds
+    fetchAllTasks();
+    setInterval(fetchAllTasks, 5000);
+    return;
+  }
+
+  // Live updates: a snapshot on (re)connect, then per-task deltas
+  const source = new EventSource("/api/tasks/stream");
+  source.addEventListener("snapshot", (event) => {
+    tasks = JSON.parse(event.data);
+    renderTasks(tasks);
+  });
+  source.addEventListener("task", (event) => {
+    applyDelta(JSON.parse(event.data));
+  });
+  source.addEventListener("error", () => {
+    // Refused (too many streams on the server): poll instead
+    if (source.readyState === EventSource.CLOSED) {
+      fetchAllTasks();
+      setInterval(fetchAllTasks, 5000);
+    }
+  });
 });
\ No newline at end of file
@@ -114,7 +114,9 @@ document.addEventListener("DOMContentLoaded", () => {
 
       const data = await res.json();
       if (data.status === "initiated") {
-        summaryStatus.innerText = `Summarization started. Task ID: ${data.task_id}`;
+        summaryStatus.innerText = data.attached
+          ? `Already being summarized. Following Task ID: ${data.task_id}`
+          : `Summarization started. Task ID: ${data.task_id}`;
         summaryStatus.className = "mt-2 text-sm text-green-500 dark:text-green-400";
       } else {
         summaryStatus.innerText = `Error: ${data.message}`;
@@ -1,15 +1,26 @@
 import os
 import re
 import json
-import ollama
+import logging
+import time
+import threading
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from dotenv import load_dotenv
 
 
 load_dotenv()
-ollama_host = os.getenv("REMOTE_OLLAMA_HOST")
-print(f"ollama_host: {ollama_host}")
 
-client = ollama.Client(host='http://' + ollama_host + ':11434')
+import llm_cache  # reads DATABASE_URL, so after load_dotenv()
+from db.transcript_segments import iter_segments
+from token_utils import get_encoding, count_tokens_or_estimate
+from ollama_scheduler import get_model_concurrency, get_keep_alive, response_usage
+from ollama_pool import get_pool
+
+logger = logging.getLogger(__name__)
+
+# The four summary fields, in the order they are stored.
+PROMPT_KINDS = ("concise", "key_topics", "takeaways", "comprehensive")
 
 def split_into_sentences(text):
     """
@@ -35,7 +46,8 @@ def split_into_sentences(text):
 
 def chunk_transcript(transcript, max_words_per_chunk=4000):
     """
-    Improved chunker:
+    Word-based chunker (see iter_transcript_chunks for the token- and
+    model-aware one used by summarize_v2):
     1) Split transcript into sentences.
     2) Combine sentences into chunks until we reach ~4k words.
     3) If a single sentence is >4k words, we split that sentence by words.
@@ -85,18 +97,11 @@ def chunk_transcript(transcript, max_words_per_chunk=4000):
 # 2) IMPROVED PROMPT ENGINEERING
 # ----------------------------
 
-def build_prompts_for_chunk(chunk_text):
-    """
-    Return a dict of four prompts: 
-    - "concise": a short summary 
-    - "key_topics": high-level topics
-    - "takeaways": key insights, lessons 
-    - "comprehensive": thorough notes capturing examples, references, quotes, etc.
-    
-    We add a bit more "context" or "instruction" for each prompt.
-    """
-    return {
-        "concise": f"""
+# Prompt templates, one per summary field ({chunk_text} is filled in).
+# Their hashes key the LLM result cache (llm_cache.py), so editing one
+# only invalidates that prompt's cached outputs.
+PROMPT_TEMPLATES = {
+    "concise": """
 You are an expert summarizer. Read the following text and produce a concise summary 
 (no more than 150 words) covering the main idea only:
 
@@ -104,7 +109,7 @@ TEXT:
 {chunk_text}
 """.strip(),
 
-        "key_topics": f"""
+    "key_topics": """
 You are an expert note-taker. From the following text, list the main topics or themes 
 (with short bullet points), focusing on clarity and coverage:
 
@@ -112,7 +117,7 @@ TEXT:
 {chunk_text}
 """.strip(),
 
-        "takeaways": f"""
+    "takeaways": """
 You are a teaching assistant. From the text below, list the key takeaways or lessons 
 the reader should remember. Focus on clarity and practical insights, in short bullet points:
 
@@ -120,7 +125,7 @@ TEXT:
 {chunk_text}
 """.strip(),
 
-        "comprehensive": f"""
+    "comprehensive": """
 You are a meticulous researcher. Provide a comprehensive set of notes about 
 the following text, capturing major points, examples, references, or quotes. 
 Organize your notes with headings or bullet points. Aim for thoroughness:
@@ -128,6 +133,22 @@ Organize your notes with headings or bullet points. Aim for thoroughness:
 TEXT:
 {chunk_text}
 """.strip()
+}
+
+def build_prompts_for_chunk(chunk_text):
+    """
+    Return a dict of four prompts: 
+    - "concise": a short summary 
+    - "key_topics": high-level topics
+    - "takeaways": key insights, lessons 
+    - "comprehensive": thorough notes capturing examples, references, quotes, etc.
+    
+    We add a bit more "context" or "instruction" for each prompt
+    (see PROMPT_TEMPLATES).
+    """
+    return {
+        kind: template.format(chunk_text=chunk_text)
+        for kind, template in PROMPT_TEMPLATES.items()
     }
 
 def ollama_generate_chunk(model_name, prompt):
@@ -136,16 +157,529 @@ def ollama_generate_chunk(model_name, prompt):
     We demonstrate extra parameters like 'temperature' or 'top_p' if desired.
     """
     try:
-        response = client.chat(
-        model=model_name,
-        messages=[{"role": "user", "content": prompt}]
-    )
+        response = get_pool().run(model_name, lambda backend: backend.client.chat(
+            model=model_name,
+            messages=[{"role": "user", "content": prompt}],
+            options={"num_ctx": get_model_context(model_name)},
+            keep_alive=get_keep_alive(model_name)
+        ), hedge=True)
         #enhanced_text = response.get("message", {}).get("content", "").strip()
         #resp = requests.post(url, json=payload, timeout=300)
         #resp.raise_for_status()
         data = response.get("message", {}).get("content", "").strip()
         return data #.get("content", "").strip()
     except Exception as e:
-        #logger.error(f"Ollama request failed: {e}")
-        print(f"Ollama request failed: {e}")
-        return ""
\ No newline at end of file
+        logger.error(f"Ollama request failed: {e}")
+        return ""
+
+# ----------------------------
+# 3) STRUCTURED (SINGLE-CALL) MODE
+# ----------------------------
+
+# What each JSON field should contain; mirrors the four separate prompts.
+STRUCTURED_FIELDS = {
+    "concise": "a concise summary (no more than 150 words) covering the main idea only",
+    "key_topics": "the main topics or themes as short bullet points, one per line starting with \"- \"",
+    "takeaways": "the key takeaways or lessons the reader should remember, focusing on clarity "
+                 "and practical insights, as short bullet points, one per line starting with \"- \"",
+    "comprehensive": "comprehensive notes capturing major points, examples, references or quotes, "
+                     "organized with headings or bullet points (Markdown); aim for thoroughness",
+}
+
+
+STRUCTURED_TEMPLATE = """
+You are an expert summarizer and note-taker. Read the following text and respond
+with a JSON object containing exactly these string fields:
+{field_lines}
+
+TEXT:
+{chunk_text}
+""".strip()
+
+
+def build_structured_prompt(chunk_text, fields=PROMPT_KINDS):
+    """
+    One prompt asking for all requested summary fields as a JSON object,
+    so the chunk is sent to (and prefilled by) the model once instead of
+    once per field.
+    """
+    field_lines = "\n".join(f'- "{field}": {STRUCTURED_FIELDS[field]}' for field in fields)
+    return STRUCTURED_TEMPLATE.format(field_lines=field_lines, chunk_text=chunk_text)
+
+
+def _structured_schema(fields):
+    return {
+        "type": "object",
+        "properties": {field: {"type": "string"} for field in fields},
+        "required": list(fields),
+    }
+
+
+def _field_text(value):
+    """
+    Validate one JSON field: non-empty text, or a list of strings (models
+    sometimes return bullet lists as arrays). Returns None if invalid.
+    """
+    if isinstance(value, list) and value and all(isinstance(v, str) for v in value):
+        value = "\n".join(v if v.lstrip().startswith("-") else f"- {v}" for v in value)
+    if isinstance(value, str) and value.strip():
+        return value.strip()
+    return None
+
+
+def ollama_generate_structured(model_name, prompt, fields):
+    """
+    Ask for JSON constrained to `fields` (Ollama structured outputs) and
+    return { field: text } for the fields that came back valid.
+    """
+    try:
+        response = get_pool().run(model_name, lambda backend: backend.client.chat(
+            model=model_name,
+            messages=[{"role": "user", "content": prompt}],
+            format=_structured_schema(fields),
+            options={"num_ctx": get_model_context(model_name)},
+            keep_alive=get_keep_alive(model_name)
+        ), hedge=True)
+        data = json.loads(response.get("message", {}).get("content", ""))
+    except Exception as e:
+        logger.error(f"Ollama structured request failed: {e}")
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    parsed = {}
+    for field in fields:
+        text = _field_text(data.get(field))
+        if text is not None:
+            parsed[field] = text
+    return parsed
+
+
+def summarize_chunk_structured(model_name, chunk_text, fields=PROMPT_KINDS):
+    """
+    Single-call summary of one chunk => { kind: text } for the requested
+    fields (default: all PROMPT_KINDS).
+    Fields missing or invalid in the reply are re-requested on their own
+    (up to STRUCTURED_MAX_RETRIES times); anything still missing falls
+    back to that field's regular prompt.
+    """
+    retries = int(os.getenv("STRUCTURED_MAX_RETRIES", "1"))
+    result = {}
+    missing = list(fields)
+    for attempt in range(retries + 1):
+        result.update(ollama_generate_structured(
+            model_name, build_structured_prompt(chunk_text, missing), missing
+        ))
+        missing = [kind for kind in fields if kind not in result]
+        if not missing:
+            return result
+        logger.warning(f"Structured summary missing {missing} (attempt {attempt + 1}/{retries + 1})")
+
+    prompts = build_prompts_for_chunk(chunk_text)
+    for kind in missing:
+        result[kind] = ollama_generate_chunk(model_name, prompts[kind])
+    return result
+
+# ----------------------------
+# 4) PREFIX-SHARED MODE
+# ----------------------------
+
+# The four prompts above each start with their own instruction, so Ollama
+# has to prefill the whole chunk four times. Here the chunk comes first and
+# is identical in all four prompts; only the instruction at the end
+# differs. The four prompts of a chunk are sent one after another to the
+# same backend, so the server finds the chunk already in its prompt (KV)
+# cache and only processes the instruction.
+SHARED_PREFIX_TEMPLATE = """
+Read the following text. A task about it follows after the text.
+
+TEXT:
+{chunk_text}
+""".strip()
+
+SHARED_INSTRUCTIONS = {
+    "concise": """
+TASK: You are an expert summarizer. Produce a concise summary of the text above
+(no more than 150 words) covering the main idea only.
+""".strip(),
+
+    "key_topics": """
+TASK: You are an expert note-taker. From the text above, list the main topics or themes
+(with short bullet points), focusing on clarity and coverage.
+""".strip(),
+
+    "takeaways": """
+TASK: You are a teaching assistant. From the text above, list the key takeaways or lessons
+the reader should remember. Focus on clarity and practical insights, in short bullet points.
+""".strip(),
+
+    "comprehensive": """
+TASK: You are a meticulous researcher. Provide a comprehensive set of notes about
+the text above, capturing major points, examples, references, or quotes.
+Organize your notes with headings or bullet points. Aim for thoroughness.
+""".strip()
+}
+
+
+def build_shared_prompts(chunk_text):
+    """
+    { kind: prompt } where every prompt is the same chunk prefix followed
+    by that kind's instruction.
+    """
+    prefix = SHARED_PREFIX_TEMPLATE.format(chunk_text=chunk_text)
+    return {kind: f"{prefix}\n\n{instruction}" for kind, instruction in SHARED_INSTRUCTIONS.items()}
+
+
+def summarize_chunk_shared(model_name, chunk_text, fields=PROMPT_KINDS):
+    """
+    Prefix-shared summary of one chunk => { kind: text } for the requested
+    fields. The prompts run back to back in one scheduler turn on one
+    backend (so the chunk stays in that server's prompt cache); their
+    prefill times go to the scheduler stats (/api/ollama/scheduler), which
+    are the record of them. Not hedged: a duplicate on a second backend
+    would start the whole sequence over without the cached prefix.
+    A failed chunk yields empty texts, like a failed regular prompt.
+    """
+    prompts = build_shared_prompts(chunk_text)
+
+    def run(backend):
+        return [
+            backend.client.chat(
+                model=model_name,
+                messages=[{"role": "user", "content": prompts[kind]}],
+                options={"num_ctx": get_model_context(model_name)},
+                keep_alive=get_keep_alive(model_name)
+            )
+            for kind in fields
+        ]
+
+    try:
+        responses = get_pool().run(model_name, run)
+    except Exception as e:
+        logger.error(f"Ollama prefix-shared request failed: {e}")
+        return {kind: "" for kind in fields}
+    result = {}
+    for kind, response in zip(fields, responses):
+        usage = response_usage(response)
+        logger.debug(f"[{model_name}] {kind}: prefill {usage['prompt_tokens']} tokens "
+                     f"in {usage['prefill_seconds']:.2f}s")
+        result[kind] = response.get("message", {}).get("content", "").strip()
+    return result
+
+# ----------------------------
+# 5) CONCURRENT DISPATCH
+# ----------------------------
+
+SUMMARIZE_MODES = ("prompts", "shared", "structured")
+
+
+def get_summarize_mode(mode=None):
+    """
+    "prompts" (four prompts per chunk), "shared" (four prompts sharing the
+    chunk as prefix) or "structured" (one JSON call per chunk); defaults to
+    SUMMARIZE_MODE.
+    """
+    mode = (mode or os.getenv("SUMMARIZE_MODE", "prompts")).lower()
+    if mode not in SUMMARIZE_MODES:
+        raise ValueError(f"Unknown summarize mode '{mode}'")
+    return mode
+
+
+def template_hashes(mode):
+    """
+    { kind: hash of the template that produces it in this mode } for the
+    LLM result cache.
+    """
+    if mode == "structured":
+        return {
+            kind: llm_cache.text_hash(f"{STRUCTURED_TEMPLATE}\n{kind}: {STRUCTURED_FIELDS[kind]}")
+            for kind in PROMPT_KINDS
+        }
+    if mode == "shared":
+        return {
+            kind: llm_cache.text_hash(f"{SHARED_PREFIX_TEMPLATE}\n\n{SHARED_INSTRUCTIONS[kind]}")
+            for kind in PROMPT_KINDS
+        }
+    return {kind: llm_cache.text_hash(PROMPT_TEMPLATES[kind]) for kind in PROMPT_KINDS}
+
+
+def summarize_chunks(model_name, chunks, mode=None, on_chunk_done=None):
+    """
+    Summarize every chunk and return
+    { kind: [text for chunk 0, text for chunk 1, ...] } for each of
+    PROMPT_KINDS, in chunk order.
+
+    In "prompts" mode each chunk gets the four prompts; in "shared" mode
+    the four prompts run back to back with the chunk as a common prefix
+    (see summarize_chunk_shared); in "structured" mode one JSON call (see
+    summarize_chunk_structured).
+    Outputs already in the LLM result cache (same model, template and
+    chunk text) are reused; only the rest are generated, then cached.
+    Calls for all chunks are dispatched concurrently, up to the model's
+    OLLAMA_MODEL_CONCURRENCY (enforced process-wide by the Ollama
+    scheduler); prompts are built as slots free up, so only a bounded
+    number exist at once. (The Ollama server must also allow parallel
+    requests, see OLLAMA_NUM_PARALLEL.)
+
+    on_chunk_done(tokens), if given, is called (in the calling thread) as
+    each chunk's outputs are all in, with the number of tokens generated
+    for it (0 if it came entirely from the cache).
+    """
+    mode = get_summarize_mode(mode)
+    results = {kind: [] for kind in PROMPT_KINDS}
+    limit = get_model_concurrency(model_name)
+    hashes = template_hashes(mode)
+    chunk_hashes = []
+    cache_hits = 0
+    pending = {}          # chunk index -> [outputs still to come, tokens generated]
+
+    def tasks():
+        # (chunk index, kind or None for a whole-chunk result, call)
+        nonlocal cache_hits
+        for index, chunk_text in enumerate(chunks):
+            chunk_hash = llm_cache.text_hash(chunk_text)
+            chunk_hashes.append(chunk_hash)
+            cached = llm_cache.lookup(model_name, chunk_hash, hashes.values())
+            missing = []
+            for kind in PROMPT_KINDS:
+                results[kind].append(cached.get(hashes[kind], ""))
+                if hashes[kind] not in cached:
+                    missing.append(kind)
+            cache_hits += len(PROMPT_KINDS) - len(missing)
+            if not missing:
+                if on_chunk_done:
+                    on_chunk_done(0)
+                continue
+            pending[index] = [len(missing), 0]
+            if mode == "structured":
+                yield index, None, partial(summarize_chunk_structured, model_name, chunk_text, missing)
+                continue
+            if mode == "shared":
+                yield index, None, partial(summarize_chunk_shared, model_name, chunk_text, missing)
+                continue
+            prompts = build_prompts_for_chunk(chunk_text)
+            for kind in missing:
+                yield index, kind, partial(ollama_generate_chunk, model_name, prompts[kind])
+
+    def store(index, kind, value):
+        outputs = value if kind is None else {kind: value}
+        for field, text in outputs.items():
+            results[field][index] = text
+            llm_cache.store(model_name, hashes[field], chunk_hashes[index], text)
+        if not on_chunk_done:
+            return
+        state = pending[index]
+        state[0] -= len(outputs)
+        state[1] += sum(count_tokens_or_estimate(text) for text in outputs.values() if text)
+        if state[0] <= 0:
+            del pending[index]
+            on_chunk_done(state[1])
+
+    if limit <= 1:
+        for index, kind, call in tasks():
+            store(index, kind, call())
+        _log_cache_hits(cache_hits, len(chunk_hashes))
+        return results
+
+    with ThreadPoolExecutor(max_workers=limit, thread_name_prefix="ollama") as executor:
+        in_flight = {}
+        for index, kind, call in tasks():
+            future = executor.submit(call)
+            in_flight[future] = (index, kind)
+            while len(in_flight) >= limit * 2:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    store(*in_flight.pop(future), future.result())
+        for future in list(in_flight):
+            store(*in_flight.pop(future), future.result())
+    _log_cache_hits(cache_hits, len(chunk_hashes))
+    return results
+
+
+def _log_cache_hits(cache_hits, chunk_count):
+    if cache_hits:
+        logger.info(f"LLM cache: reused {cache_hits}/{chunk_count * len(PROMPT_KINDS)} chunk outputs")
+
+# ----------------------------
+# 6) TOKEN-AWARE CHUNKING
+# ----------------------------
+
+_model_contexts = {}
+_model_contexts_lock = threading.Lock()
+# A failed /api/show is remembered this long (model -> retry time), so a
+# down or slow backend isn't asked again for every chunk.
+CONTEXT_RETRY_SECONDS = 60
+_model_context_failures = {}
+
+# Sentence-ish units for transcripts without segment timing.
+_TEXT_UNIT = re.compile(r"[^.?!\n]*(?:[.?!]+|\n|$)")
+_SENTENCE_END = re.compile(r"[.?!][\"')\]]*$")
+
+
+def get_model_context(model_name):
+    """
+    Context window (in tokens) to use for model_name: an explicit num_ctx
+    from the model's Modelfile, else its trained context length, as
+    reported by Ollama's /api/show, capped at OLLAMA_NUM_CTX. Requests pass
+    it as options.num_ctx so the server uses the same window the chunks
+    were sized for. Falls back to OLLAMA_NUM_CTX if the model can't be
+    queried, for CONTEXT_RETRY_SECONDS before asking again.
+    """
+    cap = int(os.getenv("OLLAMA_NUM_CTX", "8192"))
+    with _model_contexts_lock:
+        if model_name in _model_contexts:
+            return _model_contexts[model_name]
+        if _model_context_failures.get(model_name, 0) > time.monotonic():
+            return cap
+    try:
+        info = get_pool().pick(model_name).client.show(model_name)
+    except Exception as e:
+        logger.warning(f"Could not read context size of '{model_name}' from Ollama: {e}")
+        with _model_contexts_lock:
+            _model_context_failures[model_name] = time.monotonic() + CONTEXT_RETRY_SECONDS
+        return cap
+
+    context = None
+    match = re.search(r"^\s*num_ctx\s+(\d+)", getattr(info, "parameters", None) or "", re.M)
+    if match:
+        context = int(match.group(1))
+    else:
+        for key, value in (getattr(info, "modelinfo", None) or {}).items():
+            if key.endswith(".context_length"):
+                context = int(value)
+                break
+    context = min(context, cap) if context else cap
+    with _model_contexts_lock:
+        _model_contexts[model_name] = context
+        _model_context_failures.pop(model_name, None)
+    return context
+
+
+def get_chunk_token_budget(model_name, mode=None):
+    """
+    Tokens of transcript that fit in one prompt: the model's context minus
+    the longest prompt template (any mode) and the room reserved for the
+    reply, SUMMARY_OUTPUT_TOKENS per field it carries (all four at once in
+    structured mode, so its chunks are smaller).
+    """
+    reserve = int(os.getenv("SUMMARY_OUTPUT_TOKENS", "1024"))
+    if get_summarize_mode(mode) == "structured":
+        reserve *= len(PROMPT_KINDS)
+    overhead = max(
+        count_tokens_or_estimate(prompt)
+        for prompt in [*build_prompts_for_chunk("").values(),
+                       *build_shared_prompts("").values(),
+                       build_structured_prompt("")]
+    ) + 32  # chat template tokens
+    return max(256, get_model_context(model_name) - reserve - overhead)
+
+
+def iter_transcript_chunks(model_name, transcript, segments_blob=None, total_tokens=None, mode=None):
+    """
+    Lazily yield chunks of transcript that each fit the model's budget in
+    the summarize mode (see get_chunk_token_budget), measured in real
+    tokens.
+
+    Chunk boundaries prefer sentence ends and, since auto-generated
+    captions have almost no punctuation, the largest pauses between
+    caption segments (from the packed segment timing, when available).
+    total_tokens (the stored Video.tokens_no_ts) short-circuits
+    transcripts that fit in one chunk.
+    """
+    if not transcript:
+        return
+    budget = get_chunk_token_budget(model_name, mode)
+    if total_tokens and 0 < total_tokens <= budget:
+        yield transcript
+        return
+    if segments_blob:
+        units = _segment_units(segments_blob, transcript)
+    else:
+        units = _text_units(transcript)
+    yield from _pack_units(units, budget)
+
+
+def _segment_units(segments_blob, transcript):
+    """
+    (text, boundary score) per caption segment; the score rates cutting
+    right after it: a sentence end scores 3, plus the pause before the
+    next segment in seconds (up to 3).
+    """
+    previous = None
+    for segment in iter_segments(segments_blob, transcript):
+        if previous is not None:
+            gap = segment["start"] - (previous["start"] + previous["duration"])
+            yield previous["text"], _boundary_score(previous["text"], gap)
+        previous = segment
+    if previous is not None:
+        yield previous["text"], 6.0
+
+
+def _text_units(transcript):
+    for match in _TEXT_UNIT.finditer(transcript):
+        text = match.group(0)
+        if text.strip():
+            yield text, _boundary_score(text, 1.0 if text.endswith("\n") else 0.0)
+
+
+def _boundary_score(text, gap):
+    score = 3.0 if _SENTENCE_END.search(text.rstrip()) else 0.0
+    return score + min(max(gap, 0.0), 3.0)
+
+
+def _pack_units(units, budget):
+    """
+    Greedily fill chunks up to budget tokens. When the next unit doesn't
+    fit, cut at the best-scoring boundary in the last part of the chunk
+    (past SUMMARY_CHUNK_MIN_FILL of the budget) and carry the rest over.
+    """
+    min_fill = float(os.getenv("SUMMARY_CHUNK_MIN_FILL", "0.6")) * budget
+    current = []  # (text, tokens, score)
+    current_tokens = 0
+    for text, score in units:
+        text = text.strip()
+        if not text:
+            continue
+        tokens = count_tokens_or_estimate(text)
+        if tokens > budget:
+            if current:
+                yield " ".join(unit[0] for unit in current)
+                current, current_tokens = [], 0
+            yield from _split_by_tokens(text, budget)
+            continue
+        while current and current_tokens + tokens > budget:
+            cut = _best_cut(current, min_fill)
+            yield " ".join(unit[0] for unit in current[:cut])
+            current = current[cut:]
+            current_tokens = sum(unit[1] for unit in current)
+        current.append((text, tokens, score))
+        current_tokens += tokens
+    if current:
+        yield " ".join(unit[0] for unit in current)
+
+
+def _best_cut(units, min_fill):
+    """
+    Number of units to emit: after the highest-scoring boundary once the
+    chunk holds at least min_fill tokens (latest wins ties), else all.
+    """
+    best_cut, best_score = len(units), -1.0
+    filled = 0
+    for index, (_, tokens, score) in enumerate(units):
+        filled += tokens
+        if filled >= min_fill and score >= best_score:
+            best_cut, best_score = index + 1, score
+    return best_cut
+
+
+def _split_by_tokens(text, budget):
+    """Last resort for a single unit longer than the budget."""
+    encoding = get_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        for start in range(0, len(tokens), budget):
+            yield encoding.decode(tokens[start:start + budget])
+        return
+    words = text.split()
+    step = max(1, budget * 3 // 4)  # ~0.75 words per token
+    for start in range(0, len(words), step):
+        yield " ".join(words[start:start + step])
@@ -0,0 +1,56 @@
+# token_utils.py
+import os
+import logging
+import threading
+
+import tiktoken
+
+logger = logging.getLogger(__name__)
+
+_encoding = None
+_encoding_failed = False
+_encoding_lock = threading.Lock()
+
+
+def get_encoding():
+    """
+    Return the tiktoken encoding (TIKTOKEN_ENCODING, default cl100k_base),
+    or None if its BPE file can't be loaded (e.g. offline on first use).
+    The failure is logged once and not retried.
+    """
+    global _encoding, _encoding_failed
+    if _encoding is not None or _encoding_failed:
+        return _encoding
+    with _encoding_lock:
+        if _encoding is None and not _encoding_failed:
+            try:
+                _encoding = tiktoken.get_encoding(os.getenv("TIKTOKEN_ENCODING", "cl100k_base"))
+            except Exception as e:
+                logger.warning(f"Exact token counting unavailable: {e}")
+                _encoding_failed = True
+    return _encoding
+
+
+def count_tokens(text):
+    """
+    Exact token count of text, or None if no encoding is available.
+    """
+    if not text:
+        return 0
+    encoding = get_encoding()
+    if encoding is None:
+        return None
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def estimate_tokens(text):
+    """
+    Rough token count (~4 characters per token for English text), for
+    when no encoding is available.
+    """
+    return (len(text) + 3) // 4 if text else 0
+
+
+def count_tokens_or_estimate(text):
+    tokens = count_tokens(text)
+    return estimate_tokens(text) if tokens is None else tokens
@@ -0,0 +1,171 @@
+# transcript_cache.py
+import os
+import gzip
+import json
+import hashlib
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class TranscriptCacheMiss(Exception):
+    """Raised in replay mode when something isn't in the local cache."""
+
+
+class TranscriptCache:
+    """
+    On-disk, gzip-compressed cache of raw transcript segments
+    ([ {"text", "start", "duration"}, ... ]) keyed by (video_id, language),
+    plus full playlist listings so a whole ingestion run can be replayed
+    offline.
+
+    Files are content-addressed by a SHA-256 of their key and spread over
+    256 sub-directories. Total size is bounded by max_bytes; the least
+    recently used files (by mtime, refreshed on every hit) are evicted first.
+    """
+    def __init__(self, cache_dir, max_bytes, replay=False):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.replay = replay
+        self._lock = threading.Lock()
+        self._index = None  # path -> [size, last_used]
+        self._total_bytes = 0
+
+    # ---------- transcripts ----------
+
+    def get(self, video_id, language):
+        return self._read(("transcript", video_id, language))
+
+    def put(self, video_id, language, segments):
+        self._write(("transcript", video_id, language), segments)
+
+    # ---------- playlist listings ----------
+
+    def get_listing(self, channel_url):
+        """
+        Return (channel_id, videos) from the last full listing of channel_url, or None.
+        """
+        data = self._read(("listing", channel_url))
+        if data is None:
+            return None
+        return data["channel_id"], data["videos"]
+
+    def put_listing(self, channel_url, channel_id, videos):
+        self._write(("listing", channel_url), {"channel_id": channel_id, "videos": videos})
+
+    # ---------- storage ----------
+
+    def _path(self, key):
+        digest = hashlib.sha256(json.dumps(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], digest[2:] + ".json.gz")
+
+    def _read(self, key):
+        path = self._path(key)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Dropping unreadable transcript cache file {path}: {e}")
+            self._remove(path)
+            return None
+
+        # Refresh recency for LRU eviction.
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            self._load_index()
+            if path in self._index:
+                self._index[path][1] = time.time()
+        return data
+
+    def _write(self, key, data):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+        stat = os.stat(path)
+        with self._lock:
+            self._load_index()
+            old = self._index.get(path)
+            if old:
+                self._total_bytes -= old[0]
+            self._index[path] = [stat.st_size, stat.st_mtime]
+            self._total_bytes += stat.st_size
+            self._evict()
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        with self._lock:
+            if self._index is not None and path in self._index:
+                self._total_bytes -= self._index.pop(path)[0]
+
+    def _load_index(self):
+        """Scan the cache directory once per process (caller holds the lock)."""
+        if self._index is not None:
+            return
+        self._index = {}
+        self._total_bytes = 0
+        if not os.path.isdir(self.cache_dir):
+            return
+        for sub in os.scandir(self.cache_dir):
+            if not sub.is_dir():
+                continue
+            for entry in os.scandir(sub.path):
+                if entry.name.endswith(".json.gz"):
+                    stat = entry.stat()
+                    self._index[entry.path] = [stat.st_size, stat.st_mtime]
+                    self._total_bytes += stat.st_size
+
+    def _evict(self):
+        """
+        Drop least recently used files once over max_bytes (caller holds the
+        lock). Evicts down to 90% so a full cache doesn't re-sort on every write.
+        """
+        if self.max_bytes <= 0 or self._total_bytes <= self.max_bytes:
+            return
+        target = self.max_bytes * 0.9
+        for path, (size, _) in sorted(self._index.items(), key=lambda item: item[1][1]):
+            if self._total_bytes <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            del self._index[path]
+            self._total_bytes -= size
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_transcript_cache():
+    """
+    Return the process-wide cache, or None when TRANSCRIPT_CACHE_MODE=off.
+    Modes: "on" (read-through, default) or "replay" (serve only from the
+    cache and never touch the network).
+    """
+    global _cache
+    mode = os.getenv("TRANSCRIPT_CACHE_MODE", "on").lower()
+    if mode == "off":
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = TranscriptCache(
+                os.getenv("TRANSCRIPT_CACHE_DIR", os.path.join("data", "transcript_cache")),
+                int(float(os.getenv("TRANSCRIPT_CACHE_MAX_MB", "1024")) * 1024 * 1024),
+                replay=(mode == "replay")
+            )
+    return _cache
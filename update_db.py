@@ -24,11 +24,87 @@ engine = create_engine(DB_URL)
 with engine.connect() as conn:
     # Try to add the new column; if it already exists, an exception will be printed.
     try:
-        conn.execute(text("ALTER TABLE video_folders ADD COLUMN original_playlist_id VARCHAR(255)"))
+        conn.execute(text("ALTER TABLE video_folders ADD COLUMN IF NOT EXISTS original_playlist_id VARCHAR(255)"))
         print("Column original_playlist_id added.")
     except Exception as e:
         print("Column original_playlist_id may already exist:", e)
 
     # For existing rows where original_playlist_id is NULL, copy folder_name over.
     conn.execute(text("UPDATE video_folders SET original_playlist_id = folder_name WHERE original_playlist_id IS NULL"))
-    print("Backfilled original_playlist_id for existing rows.")
\ No newline at end of file
+    print("Backfilled original_playlist_id for existing rows.")
+
+    # Remove duplicate (playlist, video) links, then enforce uniqueness so
+    # ingestion can batch-insert links with ON CONFLICT DO NOTHING.
+    conn.execute(text("""
+        DELETE FROM video_folders a
+        USING video_folders b
+        WHERE a.id > b.id
+          AND a.original_playlist_id = b.original_playlist_id
+          AND a.video_id = b.video_id
+    """))
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_video_folders_playlist_video "
+        "ON video_folders (original_playlist_id, video_id)"
+    ))
+    print("Ensured unique index on video_folders (original_playlist_id, video_id).")
+
+    # Packed transcript timing (see db/transcript_segments.py). Run
+    # compact_transcripts.py afterwards to convert existing rows.
+    conn.execute(text("ALTER TABLE videos ADD COLUMN IF NOT EXISTS transcript_segments BYTEA"))
+    print("Ensured column videos.transcript_segments.")
+
+    # Let Postgres compress the large text columns with lz4 instead of pglz
+    # (PG14+). They stay plain text for the pgai vectorizers; existing values
+    # are recompressed as rows get rewritten.
+    for table, column in [
+        ("videos", "transcript_with_ts"),
+        ("videos", "transcript_no_ts"),
+        ("summaries_v2", "concise_summary"),
+        ("summaries_v2", "key_topics"),
+        ("summaries_v2", "important_takeaways"),
+        ("summaries_v2", "comprehensive_notes"),
+    ]:
+        try:
+            with conn.begin_nested():
+                conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN {column} SET COMPRESSION lz4"))
+            print(f"Set lz4 compression on {table}.{column}.")
+        except Exception as e:
+            print(f"Could not set lz4 compression on {table}.{column}:", e)
+
+    # sync_jobs became the durable job queue (job_queue.py). Older databases
+    # may have the original table; new ones get it from create_all.
+    for column, ddl in [
+        ("job_type", "VARCHAR(50)"),
+        ("payload", "JSONB"),
+        ("progress", "JSONB"),
+        ("created_at", "TIMESTAMP"),
+        ("claimed_by", "VARCHAR(255)"),
+        ("heartbeat_at", "TIMESTAMP"),
+        ("attempts", "INTEGER DEFAULT 0"),
+    ]:
+        conn.execute(text(f"ALTER TABLE IF EXISTS sync_jobs ADD COLUMN IF NOT EXISTS {column} {ddl}"))
+    try:
+        with conn.begin_nested():
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_sync_jobs_status_id ON sync_jobs (status, id)"
+            ))
+        print("Ensured job queue columns and index on sync_jobs.")
+    except Exception as e:
+        print("Could not index sync_jobs (run init_db.py to create it):", e)
+
+    # One summary per (video, model). Keep the newest of any duplicates
+    # created before summarize jobs were coalesced.
+    conn.execute(text("""
+        DELETE FROM summaries_v2 a
+        USING summaries_v2 b
+        WHERE a.video_id = b.video_id
+          AND a.model_name = b.model_name
+          AND a.id < b.id
+    """))
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_summaries_v2_video_model "
+        "ON summaries_v2 (video_id, model_name)"
+    ))
+    print("Ensured unique index on summaries_v2 (video_id, model_name).")
+
+    conn.commit()
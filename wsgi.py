@@ -1,6 +1,8 @@
 #wsgi.py
 
-from app import app
+from app import app, init_workers
+
+init_workers()
 
 if __name__ == "__main__":
    app.run()
\ No newline at end of file
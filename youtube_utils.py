@@ -1,17 +1,30 @@
 # youtube_utils.py
 import os
 import json
+import heapq
 import logging
+import itertools
+import queue
 import subprocess
-from datetime import datetime
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime, timedelta
 
 from youtube_transcript_api import YouTubeTranscriptApi, NoTranscriptFound
 from pytube import YouTube
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import sessionmaker
 
-from db.models import Base, Video, VideoFolder
+from db.models import Base, Video, VideoFolder, PlaylistSyncState
+from db.transcript_segments import pack_segments, format_with_ts
+from token_utils import count_tokens
+from ytdlp_engine import get_engine, format_upload_date
+from transcript_cache import get_transcript_cache, TranscriptCacheMiss
+from resilience import FetchGuard, CircuitBreaker, is_transient, backoff_delay, retry_call
 
 logger = logging.getLogger(__name__)
 
@@ -24,28 +37,104 @@ engine = create_engine(
     pool_recycle=1800)  # 30 minutes
 SessionLocal = sessionmaker(bind=engine)
 
-def download_channel_transcripts(channel_url, status_dict):
+class RateLimiter:
+    """
+    Thread-safe limiter shared by all download workers of a job.
+    Hands out call slots at most `requests_per_second` apart; a value <= 0
+    disables limiting.
+    """
+    def __init__(self, requests_per_second):
+        self.interval = 1.0 / requests_per_second if requests_per_second > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def download_channel_transcripts(channel_url, status_dict, concurrency=None, requests_per_second=None,
+                                 playlist_id=None, incremental=False):
     """
     Download transcripts for all videos in a channel/playlist.
 
     Improved:
     - Skip downloading transcripts if they are already in the DB
     - Report skipped videos as processed in the status_dict
+    - Fetch transcripts on a bounded worker pool (DOWNLOAD_CONCURRENCY),
+      with all workers sharing one YOUTUBE_REQUESTS_PER_SECOND limiter.
+      Workers only do network I/O; DB writes and status_dict counters
+      stay on the calling thread, so the counters remain consistent.
+    - With incremental=True and a known playlist_id, only list entries
+      newer than the playlist's stored high-water mark (see
+      get_channel_and_videos). A full listing is still done when no mark
+      exists yet, the last full listing is older than
+      PLAYLIST_FULL_RELIST_DAYS, or the playlist isn't listed newest-first
+      (see listing_is_newest_first).
+    - Every YouTube call goes through a FetchGuard: a circuit breaker
+      pauses the job (status "paused") when transient errors spike, and
+      concurrency halves on 429s and recovers gradually. Transiently
+      failed transcript fetches are re-queued with jittered exponential
+      backoff, up to FETCH_MAX_RETRIES times, instead of being dropped.
+      They wait out the backoff on the calling thread and are resubmitted
+      once due, so no pool worker sleeps through a backoff.
+    - The playlist is listed as a stream (see iter_channel_videos): entries
+      are read ahead on a background thread and ingested window by window
+      while listing continues, so the first transcripts are fetched right
+      away and status_dict["total"] grows as entries arrive.
     """
+    if concurrency is None:
+        concurrency = int(os.getenv("DOWNLOAD_CONCURRENCY", "4"))
+    if requests_per_second is None:
+        requests_per_second = float(os.getenv("YOUTUBE_REQUESTS_PER_SECOND", "2"))
+    concurrency = max(1, concurrency)
+    rate_limiter = RateLimiter(requests_per_second)
+    max_retries = int(os.getenv("FETCH_MAX_RETRIES", "4"))
+
+    def on_circuit_open(cooldown):
+        status_dict["status"] = "paused"
+
+    def on_circuit_close():
+        status_dict["status"] = "in_progress"
+
+    guard = FetchGuard(
+        concurrency,
+        rate_limiter,
+        CircuitBreaker(on_open=on_circuit_open, on_close=on_circuit_close)
+    )
+
     # Create tables if they don't exist (or use migrations in production)
     Base.metadata.create_all(engine)
 
-    # Get the immutable channel/playlist id and video list from YouTube
-    channel_id, videos = get_channel_and_videos(channel_url)
-    total_videos = len(videos)
-    status_dict["total"] = total_videos
+    stop_at_video_id = None
+    if incremental and playlist_id:
+        stop_at_video_id = get_incremental_stop_point(playlist_id)
+
+    # Get the immutable channel/playlist id and a stream of its videos
+    channel_id, videos = retry_call(
+        iter_channel_videos, channel_url,
+        stop_at_video_id=stop_at_video_id,
+        description=f"Listing {channel_url}"
+    )
+    # Keep listing in the background while ingesting.
+    videos = ReadAhead(videos, int(os.getenv("INGEST_BATCH_SIZE", "100")) * 2)
+    status_dict["incremental"] = stop_at_video_id is not None
+    status_dict["total"] = 0
     status_dict.setdefault("processed", 0)
     status_dict.setdefault("errors", [])
     # Optionally track how many videos were skipped or newly downloaded
     status_dict.setdefault("already_downloaded", 0)
     status_dict.setdefault("newly_downloaded", 0)
+    status_dict.setdefault("retried", 0)
 
     session = SessionLocal()
+    writer = None
     try:
         # Check if there is already a folder association for this playlist id.
         existing_folder = session.query(VideoFolder).filter_by(original_playlist_id=channel_id).first()
@@ -57,195 +146,849 @@ def download_channel_transcripts(channel_url, status_dict):
             # If no folder exists yet, use the playlist id as the name.
             human_playlist_name = channel_id
 
-        processed_count = 0
-        for video_meta in videos:
-            video_id = video_meta["video_id"]
-            title = video_meta["title"]
-            upload_date = video_meta["upload_date"]
-
-            # 1) Check if this video is already in DB with a transcript
-            existing_video = (
-                session.query(Video)
-                .filter_by(video_id=video_id)
-                .first()
-            )
-            if (existing_video
-                and existing_video.transcript_no_ts
-                and existing_video.transcript_no_ts.strip() != ""):
-                # Already have a transcript => skip re-downloading
-                logger.info(f"Skipping transcript download for {video_id} (already in DB).")
-                status_dict["already_downloaded"] += 1
-
-                # Ensure folder association
-                ensure_folder_association(
-                    session,
-                    video_id,
-                    channel_id,
-                    human_playlist_name
-                )
-                
-                processed_count += 1
-                status_dict["processed"] = processed_count
-                continue
+        # Set-based prefetch: one query for this playlist's folder links,
+        # and one per listing window for which videos already have a
+        # transcript, instead of two lookups per playlist entry.
+        linked_ids = load_folder_links(session, channel_id)
+        def on_videos_written(count):
+            status_dict["newly_downloaded"] += count
 
-            # Fix unknown upload date if possible
-            if upload_date == "UnknownDate":
-                real_date = get_upload_date_for_video(video_id)
-                if real_date:
-                    upload_date = real_date
-                    video_meta["upload_date"] = real_date
+        writer = IngestBatchWriter(session, channel_id, human_playlist_name, linked_ids,
+                                   on_videos_written=on_videos_written)
 
-            # 2) Download transcript only if missing
-            try:
-                transcripts = get_transcript_for_video(video_id)
-            except Exception as e:
-                msg = f"Failed to get transcript for {video_id}: {e}"
-                logger.error(msg)
-                status_dict["errors"].append(msg)
-                processed_count += 1
-                status_dict["processed"] = processed_count
-                continue
+        # Listing order (ids only) for the high-water mark; playlists can
+        # list a video more than once, so repeats are dropped.
+        listed_ids = []
+        seen_ids = set()
 
-            # 3) Build transcript variants
-            transcript_with_ts, transcript_no_ts = build_transcript_variants(transcripts)
-
-            # 4) Upsert the Video row
-            if not existing_video:
-                video_obj = Video(
-                    video_id=video_id,
-                    title=title,
-                    upload_date=upload_date,
-                    transcript_with_ts=transcript_with_ts,
-                    transcript_no_ts=transcript_no_ts
-                )
-                session.add(video_obj)
-                session.commit()
-            else:
-                existing_video.title = title
-                existing_video.upload_date = upload_date
-                existing_video.transcript_with_ts = transcript_with_ts
-                existing_video.transcript_no_ts = transcript_no_ts
-                session.commit()
-
-            # 5) Ensure folder association
-            ensure_folder_association(
-                session,
-                video_id,
-                channel_id,
-                human_playlist_name
-            )
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            # future -> video_meta; bounded so a huge playlist doesn't
+            # queue thousands of pending fetches at once.
+            in_flight = {}
+            failed_ids = set()
+            attempts = {}
+
+            # Videos waiting to be submitted; their missing upload dates are
+            # resolved together in one batched metadata call first.
+            pending = []
+
+            # Transiently failed videos waiting out their backoff, as a heap
+            # of (ready_at, sequence, video_meta).
+            retries = []
+            retry_sequence = itertools.count()
+
+            def handle_done(future):
+                video_meta = in_flight.pop(future)
+                video_id = video_meta["video_id"]
+                error = future.exception()
+                if error is not None and is_transient(error) and attempts.get(video_id, 0) < max_retries:
+                    # Re-queue once the backoff has passed (see wait_for_progress).
+                    attempts[video_id] = attempts.get(video_id, 0) + 1
+                    delay = backoff_delay(attempts[video_id] - 1)
+                    reason = (str(error).strip().splitlines() or [type(error).__name__])[0]
+                    logger.warning(f"Transient error for {video_id} ({reason}); "
+                                   f"retry {attempts[video_id]}/{max_retries} in {delay:.1f}s")
+                    status_dict["retried"] += 1
+                    heapq.heappush(retries, (time.monotonic() + delay, next(retry_sequence), video_meta))
+                    return
+                if not _store_fetched_video(writer, future, video_meta, status_dict):
+                    failed_ids.add(video_id)
+
+            def submit(video_meta):
+                future = executor.submit(_fetch_video_transcript, video_meta, guard)
+                in_flight[future] = video_meta
+
+            def wait_for_progress():
+                # Handle finished fetches, waking up early when a retry is
+                # due, then resubmit the retries whose backoff has passed.
+                timeout = max(0.0, retries[0][0] - time.monotonic()) if retries else None
+                if in_flight:
+                    done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        handle_done(future)
+                elif timeout:
+                    time.sleep(timeout)
+                while retries and retries[0][0] <= time.monotonic():
+                    submit(heapq.heappop(retries)[2])
+
+            def submit_pending():
+                resolve_missing_upload_dates(pending, guard)
+                for video_meta in pending:
+                    submit(video_meta)
+                    while len(in_flight) >= concurrency * 2:
+                        wait_for_progress()
+                pending.clear()
 
-            # Mark one newly downloaded
-            status_dict["newly_downloaded"] += 1
+            for window in _batched(videos, writer.batch_size):
+                if status_dict.get("cancelled"):
+                    break
+                unique = []
+                for video_meta in window:
+                    if video_meta["video_id"] not in seen_ids:
+                        seen_ids.add(video_meta["video_id"])
+                        unique.append(video_meta)
+                window = unique
+                window_ids = [v["video_id"] for v in window]
+                listed_ids.extend(window_ids)
+                status_dict["total"] += len(window)
+                transcribed_ids = load_transcribed_video_ids(session, window_ids)
 
-            processed_count += 1
-            status_dict["processed"] = processed_count
+                for video_meta in window:
+                    video_id = video_meta["video_id"]
+
+                    # 1) Check if this video is already in DB with a transcript
+                    if video_id in transcribed_ids:
+                        # Already have a transcript => skip re-downloading
+                        logger.info(f"Skipping transcript download for {video_id} (already in DB).")
+                        status_dict["already_downloaded"] += 1
+
+                        # Ensure folder association
+                        writer.add_folder_link(video_id)
+
+                        status_dict["processed"] += 1
+                        continue
+
+                    # 2) Download transcript only if missing (on a worker)
+                    pending.append(video_meta)
+                    if len(pending) >= concurrency * 2:
+                        submit_pending()
+
+            if not status_dict.get("cancelled"):
+                submit_pending()
+
+            # Retries are added to in_flight while draining.
+            while in_flight or retries:
+                if status_dict.get("cancelled"):
+                    retries.clear()
+                wait_for_progress()
+
+        writer.flush()
+        if status_dict.get("cancelled"):
+            logger.warning(f"Download of '{channel_id}' cancelled; keeping the previous sync state.")
+            return
+
+        # Only a run that got this far moves the high-water mark. Stopping
+        # at a mark only works on newest-first listings; ordinary playlists
+        # list oldest-first, so those lose their mark and stay on full
+        # listings. A full listing must prove the order; an incremental one
+        # only drops the mark when it sees the wrong order.
+        newest_first = listing_is_newest_first(session, listed_ids)
+        clear_mark = newest_first is False or (newest_first is None and stop_at_video_id is None)
+        if clear_mark:
+            logger.info(f"Listing of '{channel_id}' is not known to be newest-first; "
+                        f"refreshes will list it fully.")
+        save_playlist_sync_state(
+            session,
+            channel_id,
+            None if clear_mark else next_high_water_mark(listed_ids, failed_ids),
+            full_listing=stop_at_video_id is None,
+            clear_mark=clear_mark
+        )
 
     except Exception as e:
         logger.error(f"Database error: {e}")
         status_dict["errors"].append(str(e))
     finally:
+        videos.close()
+        if writer is not None:
+            # A failed run still keeps the transcripts it already fetched.
+            try:
+                session.rollback()
+                writer.flush()
+            except Exception as e:
+                logger.error(f"Failed to write buffered videos: {e}")
+                status_dict["errors"].append(str(e))
         session.close()
 
 
-def ensure_folder_association(session, video_id, channel_id, folder_name):
+def _fetch_video_transcript(video_meta, guard):
+    """
+    Network half of a video download, run on a worker thread.
+    Does not touch the DB session.
+    """
+    return guard.call(get_transcript_for_video, video_meta["video_id"])
+
+
+def resolve_missing_upload_dates(videos, guard=None):
+    """
+    Fill in video_meta["upload_date"] for entries still marked "UnknownDate".
+    With the yt-dlp API engine all of them are resolved in one batched call;
+    otherwise (or for anything it couldn't resolve) fall back to the
+    per-video lookup. Skipped entirely in transcript cache replay mode.
+    """
+    unknown = [v for v in videos if v["upload_date"] == "UnknownDate"]
+    if not unknown:
+        return
+
+    cache = get_transcript_cache()
+    if cache and cache.replay:
+        return  # offline: keep "UnknownDate"
+
+    engine = get_engine()
+    dates = {}
+    if engine:
+        dates = engine.get_upload_dates([v["video_id"] for v in unknown], guard)
+
+    for video_meta in unknown:
+        real_date = dates.get(video_meta["video_id"])
+        if not real_date and not engine:
+            if guard:
+                real_date = guard.call(get_upload_date_for_video, video_meta["video_id"])
+            else:
+                real_date = get_upload_date_for_video(video_meta["video_id"])
+        elif not real_date:
+            real_date = _pytube_upload_date(video_meta["video_id"])
+        if real_date:
+            video_meta["upload_date"] = real_date
+
+
+def _store_fetched_video(writer, future, video_meta, status_dict):
     """
-    Helper to ensure there's a row in video_folders linking this 
-    video_id to the channel/playlist (folder_name + original_playlist_id).
+    DB half of a video download, run on the calling thread once the
+    worker's future is done: queue the Video row and its folder link
+    on the batch writer and update the status_dict counters.
+    Returns False if the transcript could not be fetched.
     """
-    folder_assoc = session.query(VideoFolder).filter_by(
-        original_playlist_id=channel_id,
-        video_id=video_id
-    ).first()
-    if not folder_assoc:
-        folder_assoc = VideoFolder(
-            folder_name=folder_name,
-            original_playlist_id=channel_id,
-            video_id=video_id,
-            last_modified=datetime.utcnow()
+    video_id = video_meta["video_id"]
+
+    try:
+        transcripts = future.result()
+    except Exception as e:
+        msg = f"Failed to get transcript for {video_id}: {e}"
+        logger.error(msg)
+        status_dict["errors"].append(msg)
+        status_dict["processed"] += 1
+        return False
+
+    # 3) Pack segments: text once (transcript_no_ts) + compact timing blob.
+    #    The timestamped variant is derived on demand (Video.timestamped_transcript).
+    transcript_segments, transcript_no_ts = pack_segments(transcripts)
+
+    # Store real token counts (0 = unknown, if no tokenizer is available)
+    # so planners and chunkers don't have to re-split the text.
+    tokens_no_ts = count_tokens(transcript_no_ts) or 0
+    tokens_with_ts = count_tokens(format_with_ts(transcript_segments, transcript_no_ts)) or 0
+
+    # 4) Upsert the Video row + 5) ensure folder association (batched)
+    writer.add_video({
+        "video_id": video_id,
+        "title": video_meta["title"],
+        "upload_date": video_meta["upload_date"],
+        "transcript_with_ts": None,
+        "transcript_no_ts": transcript_no_ts,
+        "transcript_segments": transcript_segments,
+        "tokens_no_ts": tokens_no_ts,
+        "tokens_with_ts": tokens_with_ts,
+        "last_modified": datetime.utcnow(),
+    })
+
+    # newly_downloaded is counted once the writer has stored the row
+    status_dict["processed"] += 1
+    return True
+
+
+def load_folder_links(session, channel_id):
+    """
+    Return the set of video_ids already linked to this playlist id.
+    """
+    rows = (
+        session.query(VideoFolder.video_id)
+        .filter(VideoFolder.original_playlist_id == channel_id)
+        .all()
+    )
+    return {row.video_id for row in rows}
+
+
+def load_transcribed_video_ids(session, video_ids):
+    """
+    Return the subset of video_ids that already have a non-empty transcript,
+    in a single query. Only the key column is selected, so no transcript
+    text is read.
+    """
+    if not video_ids:
+        return set()
+    rows = (
+        session.query(Video.video_id)
+        .filter(
+            Video.video_id.in_(video_ids),
+            Video.transcript_no_ts.isnot(None),
+            Video.transcript_no_ts != ""
         )
-        session.add(folder_assoc)
-        session.commit()
+        .all()
+    )
+    return {row.video_id for row in rows}
+
+
+class IngestBatchWriter:
+    """
+    Buffers Video rows and VideoFolder links produced by an ingestion run
+    and writes them with batched INSERT ... ON CONFLICT statements,
+    committing once per batch instead of once per row. Rows are keyed by
+    video_id (one statement can't upsert the same row twice); a batch
+    whose write fails is dropped, not retried. on_videos_written(count)
+    is called after each committed batch.
+    """
+    def __init__(self, session, channel_id, folder_name, linked_ids=None, batch_size=None,
+                 on_videos_written=None):
+        if batch_size is None:
+            batch_size = int(os.getenv("INGEST_BATCH_SIZE", "100"))
+        self.session = session
+        self.channel_id = channel_id
+        self.folder_name = folder_name
+        self.linked_ids = set(linked_ids or ())
+        self.batch_size = max(1, batch_size)
+        self.on_videos_written = on_videos_written
+        self.video_rows = {}
+        self.folder_video_ids = []
+
+    def add_video(self, row):
+        self.video_rows[row["video_id"]] = row
+        self.add_folder_link(row["video_id"])
+        if len(self.video_rows) >= self.batch_size:
+            self.flush()
+
+    def add_folder_link(self, video_id):
+        if video_id in self.linked_ids:
+            return
+        self.linked_ids.add(video_id)
+        self.folder_video_ids.append(video_id)
+        if len(self.folder_video_ids) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.video_rows and not self.folder_video_ids:
+            return
+        video_rows, folder_video_ids = list(self.video_rows.values()), self.folder_video_ids
+        self.video_rows, self.folder_video_ids = {}, []
+
+        # Videos first so the folder links' foreign keys resolve.
+        if video_rows:
+            stmt = pg_insert(Video)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[Video.video_id],
+                set_={
+                    "title": stmt.excluded.title,
+                    "upload_date": stmt.excluded.upload_date,
+                    "transcript_with_ts": stmt.excluded.transcript_with_ts,
+                    "transcript_no_ts": stmt.excluded.transcript_no_ts,
+                    "transcript_segments": stmt.excluded.transcript_segments,
+                    "tokens_no_ts": stmt.excluded.tokens_no_ts,
+                    "tokens_with_ts": stmt.excluded.tokens_with_ts,
+                    "last_modified": stmt.excluded.last_modified,
+                }
+            )
+            self.session.execute(stmt, video_rows)
+
+        if folder_video_ids:
+            now = datetime.utcnow()
+            stmt = pg_insert(VideoFolder).on_conflict_do_nothing(
+                index_elements=[VideoFolder.original_playlist_id, VideoFolder.video_id]
+            )
+            self.session.execute(stmt, [
+                {
+                    "folder_name": self.folder_name,
+                    "original_playlist_id": self.channel_id,
+                    "video_id": video_id,
+                    "last_modified": now,
+                }
+                for video_id in folder_video_ids
+            ])
+
+        self.session.commit()
+        # Keep the session's identity map bounded on long runs.
+        self.session.expunge_all()
+        if video_rows and self.on_videos_written:
+            self.on_videos_written(len(video_rows))
+
+
+def get_incremental_stop_point(playlist_id):
+    """
+    Return the high-water mark video_id to stop an incremental listing at,
+    or None when a full listing is due (no mark yet, or the last full
+    listing is older than PLAYLIST_FULL_RELIST_DAYS).
+    """
+    relist_days = float(os.getenv("PLAYLIST_FULL_RELIST_DAYS", "7"))
+    session = SessionLocal()
+    try:
+        state = session.get(PlaylistSyncState, playlist_id)
+        if not state or not state.newest_video_id:
+            return None
+        if (relist_days > 0 and (state.last_full_sync is None or
+                datetime.utcnow() - state.last_full_sync > timedelta(days=relist_days))):
+            logger.info(f"Last full listing of '{playlist_id}' is stale; relisting everything.")
+            return None
+        return state.newest_video_id
+    finally:
+        session.close()
+
+
+def next_high_water_mark(video_ids, failed_ids):
+    """
+    Pick the new high-water mark from a newest-first listing of video_ids.
+    Normally that's the newest entry, but it must stay below every video
+    that failed this run so the next incremental refresh lists them again.
+    Returns None to keep the existing mark.
+    """
+    last_failed = -1
+    for idx, video_id in enumerate(video_ids):
+        if video_id in failed_ids:
+            last_failed = idx
+    if last_failed + 1 < len(video_ids):
+        return video_ids[last_failed + 1]
+    return None
+
+
+def listing_is_newest_first(session, video_ids, sample=20):
+    """
+    Whether a listing of video_ids runs newest-first (as channel upload
+    playlists do), judged by the stored upload dates of its first and
+    last `sample` entries. None if that can't be told: fewer than two
+    dated entries, or all from the same day.
+    """
+    ids = list(dict.fromkeys(video_ids[:sample] + video_ids[-sample:]))
+    if len(ids) < 2:
+        return None
+    rows = session.query(Video.video_id, Video.upload_date).filter(Video.video_id.in_(ids)).all()
+    stored = {row.video_id: (row.upload_date or "").replace("-", "") for row in rows}
+    dates = [stored[video_id] for video_id in ids
+             if len(stored.get(video_id, "")) == 8 and stored[video_id].isdigit()]
+    if len(dates) < 2 or dates[0] == dates[-1]:
+        return None
+    return dates[0] > dates[-1]
+
+
+def save_playlist_sync_state(session, playlist_id, newest_video_id, full_listing=False, clear_mark=False):
+    """
+    Upsert the playlist's high-water mark. A None newest_video_id keeps
+    the stored mark unless clear_mark is set; full_listing also stamps
+    last_full_sync.
+    """
+    now = datetime.utcnow()
+    row = {
+        "playlist_id": playlist_id,
+        "newest_video_id": newest_video_id,
+        "last_synced": now,
+        "last_full_sync": now if full_listing else None,
+    }
+    stmt = pg_insert(PlaylistSyncState).values(**row)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[PlaylistSyncState.playlist_id],
+        set_={
+            "newest_video_id": (None if clear_mark else
+                                func.coalesce(stmt.excluded.newest_video_id, PlaylistSyncState.newest_video_id)),
+            "last_synced": stmt.excluded.last_synced,
+            "last_full_sync": func.coalesce(stmt.excluded.last_full_sync, PlaylistSyncState.last_full_sync),
+        }
+    )
+    session.execute(stmt)
+    session.commit()
 
 
-def get_channel_and_videos(channel_url):
+def iter_channel_videos(channel_url, stop_at_video_id=None):
+    """
+    Streaming counterpart of get_channel_and_videos: return
+      channel_id (str)
+      videos (iterator of dict): { "video_id", "title", "upload_date" }
+    where entries are yielded as yt-dlp emits them instead of after the
+    whole playlist has been read. With stop_at_video_id, iteration ends
+    just before that entry and yt-dlp stops fetching further pages.
+
+    PLAYLIST_LISTING_MODE=batch lists everything up front instead (the
+    previous behaviour). Full listings are recorded in the transcript
+    cache once the stream has been read to the end; in replay mode the
+    recorded listing is served.
+    """
+    cache = get_transcript_cache()
+    if (cache and cache.replay) or os.getenv("PLAYLIST_LISTING_MODE", "stream").lower() == "batch":
+        channel_id, videos = get_channel_and_videos(channel_url, stop_at_video_id)
+        return channel_id, iter(videos)
+
+    engine = get_engine()
+    channel_id = None
+    if engine:
+        try:
+            channel_id, videos = _stream_videos_api(engine, channel_url, stop_at_video_id)
+        except Exception as e:
+            logger.warning(f"yt-dlp API listing failed ({e}); falling back to subprocess.")
+    if channel_id is None:
+        channel_id, videos = _stream_videos_subprocess(channel_url, stop_at_video_id)
+
+    if cache and not stop_at_video_id:
+        videos = _record_listing(cache, channel_url, channel_id, videos)
+    return channel_id, videos
+
+
+def _stream_videos_api(engine, channel_url, stop_at_video_id=None):
+    channel_id, entries = engine.iter_playlist(channel_url)
+
+    def videos():
+        count = 0
+        try:
+            for entry in entries:
+                video = _entry_to_video(entry)
+                if stop_at_video_id and video["video_id"] == stop_at_video_id:
+                    logger.info(f"Found {count} new videos for '{channel_id}' "
+                                f"before high-water mark {stop_at_video_id}")
+                    return
+                count += 1
+                yield video
+        finally:
+            entries.close()
+        logger.info(f"Found {count} videos for '{channel_id}' using {channel_url}")
+
+    return channel_id, videos()
+
+
+def _stream_videos_subprocess(channel_url, stop_at_video_id=None):
+    """
+    Run yt-dlp with --lazy-playlist -j, which prints one JSON line per
+    entry as soon as it is received. The process is terminated once
+    stop_at_video_id is reached or the consumer stops iterating.
+    """
+    cmd = ["yt-dlp", "--flat-playlist", "--lazy-playlist", "-j", channel_url]
+    stderr = tempfile.TemporaryFile(mode="w+")
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr, text=True)
+
+    def error_output():
+        stderr.seek(0)
+        return stderr.read()
+
+    def cleanup():
+        if proc.poll() is None:
+            proc.terminate()
+        proc.wait()
+        proc.stdout.close()
+        stderr.close()
+
+    # Read the first entry eagerly: it carries the playlist id, and a
+    # failing yt-dlp surfaces here (where the caller can retry it).
+    first_line = proc.stdout.readline()
+    if not first_line:
+        proc.wait()
+        failed = proc.returncode != 0
+        message = error_output()
+        cleanup()
+        if failed:
+            raise Exception(f"yt-dlp failed: {message}")
+        # Empty playlist: one cheap non-streaming call for its id.
+        data = _run_ytdlp_listing(channel_url)
+        return data.get("id", "unknown_channel_id"), iter(())
+
+    first_entry = json.loads(first_line)
+    channel_id = first_entry.get("playlist_id") or "unknown_channel_id"
+
+    def videos():
+        count = 0
+        try:
+            for line in itertools.chain([first_line], proc.stdout):
+                if not line.strip():
+                    continue
+                video = _entry_to_video(json.loads(line))
+                if stop_at_video_id and video["video_id"] == stop_at_video_id:
+                    logger.info(f"Found {count} new videos for '{channel_id}' "
+                                f"before high-water mark {stop_at_video_id}")
+                    return
+                count += 1
+                yield video
+            if proc.wait() != 0:
+                raise Exception(f"yt-dlp failed after {count} entries: {error_output()}")
+        finally:
+            cleanup()
+        logger.info(f"Found {count} videos for '{channel_id}' using {channel_url}")
+
+    return channel_id, videos()
+
+
+def _record_listing(cache, channel_url, channel_id, videos):
+    """
+    Pass videos through, storing the listing in the cache once it has
+    been read completely.
+    """
+    listed = []
+    for video in videos:
+        listed.append(video)
+        yield video
+    cache.put_listing(channel_url, channel_id, listed)
+
+
+class ReadAhead:
+    """
+    Consumes an iterator on a background thread, keeping up to `size`
+    items buffered, so a listing keeps making progress while the caller
+    ingests. Errors from the iterator are re-raised in the caller.
+    close() stops the producer, which then closes the source iterator
+    (terminating a yt-dlp subprocess, releasing a borrowed YoutubeDL).
+    """
+    _END = object()
+
+    def __init__(self, iterator, size):
+        self._iterator = iterator
+        self._buffer = queue.Queue(maxsize=max(1, size))
+        self._stop = threading.Event()
+        self._done = False
+        self._producer = threading.Thread(target=self._produce, name="playlist-listing", daemon=True)
+        self._producer.start()
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._buffer.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self):
+        try:
+            for item in self._iterator:
+                if not self._put((item, None)):
+                    break
+            else:
+                self._put((self._END, None))
+        except Exception as e:
+            self._put((self._END, e))
+        finally:
+            close = getattr(self._iterator, "close", None)
+            if close:
+                close()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._done:
+            raise StopIteration
+        item, error = self._buffer.get()
+        if item is self._END:
+            self._done = True
+            if error is not None:
+                raise error
+            raise StopIteration
+        return item
+
+    def close(self):
+        self._stop.set()
+
+
+def _batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def get_channel_and_videos(channel_url, stop_at_video_id=None, page_size=None):
+    """
+    List the channel/playlist (see _list_channel_videos), going through the
+    transcript cache: full listings are recorded, and in replay mode the
+    recorded listing is served instead of calling yt-dlp.
+    """
+    cache = get_transcript_cache()
+    if cache and cache.replay:
+        listing = cache.get_listing(channel_url)
+        if listing is None:
+            raise TranscriptCacheMiss(f"No cached listing for {channel_url}")
+        channel_id, videos = listing
+        if stop_at_video_id:
+            ids = [v["video_id"] for v in videos]
+            if stop_at_video_id in ids:
+                videos = videos[:ids.index(stop_at_video_id)]
+        return channel_id, videos
+
+    channel_id, videos = _list_channel_videos(channel_url, stop_at_video_id, page_size)
+    if cache and not stop_at_video_id:
+        cache.put_listing(channel_url, channel_id, videos)
+    return channel_id, videos
+
+
+def _list_channel_videos(channel_url, stop_at_video_id=None, page_size=None):
     """
     Use yt-dlp to list all videos from the channel or playlist (fast).
     Return:
       channel_id (str)
       videos (list of dict): { "video_id", "title", "upload_date" }
+
+    If stop_at_video_id is given, list incrementally instead: stop paging
+    once that id is reached, returning only the entries before it.
+    This assumes newest-first ordering, as on channel upload playlists.
+
+    Uses the in-process yt-dlp engine when available (its playlist entries
+    are lazy, so incremental listings fetch only the pages they need);
+    otherwise the yt-dlp subprocess, paging with --playlist-items.
     """
-    cmd = ["yt-dlp", "--flat-playlist", "--dump-single-json", channel_url]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode != 0:
-        raise Exception(f"yt-dlp failed: {result.stderr}")
+    engine = get_engine()
+    if engine:
+        try:
+            return _list_videos_api(engine, channel_url, stop_at_video_id)
+        except Exception as e:
+            logger.warning(f"yt-dlp API listing failed ({e}); falling back to subprocess.")
+
+    if stop_at_video_id:
+        return _list_videos_until(channel_url, stop_at_video_id, page_size)
 
-    data = json.loads(result.stdout)
+    data = _run_ytdlp_listing(channel_url)
     channel_id = data.get("id", "unknown_channel_id")
-    entries = data.get("entries", [])
+    videos = _entries_to_videos(data.get("entries", []))
+
+    logger.info(f"Found {len(videos)} videos for '{channel_id}' using {channel_url}")
+    return channel_id, videos
+
+
+def _list_videos_api(engine, channel_url, stop_at_video_id=None):
+    channel_id, entries = engine.iter_playlist(channel_url)
     videos = []
     for entry in entries:
-        vid_id = entry.get("id")
-        vid_title = entry.get("title", "Untitled")
-        upload_date = entry.get("upload_date", "UnknownDate")
-        videos.append({
-            "video_id": vid_id,
-            "title": vid_title,
-            "upload_date": upload_date
-        })
+        video = _entry_to_video(entry)
+        if stop_at_video_id and video["video_id"] == stop_at_video_id:
+            entries.close()
+            logger.info(f"Found {len(videos)} new videos for '{channel_id}' "
+                        f"before high-water mark {stop_at_video_id}")
+            return channel_id, videos
+        videos.append(video)
 
     logger.info(f"Found {len(videos)} videos for '{channel_id}' using {channel_url}")
     return channel_id, videos
 
 
+def _list_videos_until(channel_url, stop_at_video_id, page_size=None):
+    """
+    Page through the playlist until stop_at_video_id shows up.
+    Page sizes double each round so a missing mark still finishes
+    in a logarithmic number of yt-dlp calls.
+    """
+    if page_size is None:
+        page_size = int(os.getenv("PLAYLIST_PAGE_SIZE", "50"))
+    page_size = max(1, page_size)
+
+    channel_id = None
+    videos = []
+    start = 1
+    while True:
+        end = start + page_size - 1
+        data = _run_ytdlp_listing(channel_url, ["--playlist-items", f"{start}:{end}"])
+        channel_id = channel_id or data.get("id", "unknown_channel_id")
+        page = _entries_to_videos(data.get("entries") or [])
+
+        for video in page:
+            if video["video_id"] == stop_at_video_id:
+                logger.info(f"Found {len(videos)} new videos for '{channel_id}' "
+                            f"before high-water mark {stop_at_video_id}")
+                return channel_id, videos
+            videos.append(video)
+
+        if len(page) < page_size:
+            break  # reached the end of the playlist
+        start = end + 1
+        page_size *= 2
+
+    logger.info(f"High-water mark {stop_at_video_id} not found; listed all "
+                f"{len(videos)} videos for '{channel_id}'")
+    return channel_id, videos
+
+
+def _run_ytdlp_listing(channel_url, extra_args=()):
+    """
+    Run a flat yt-dlp listing and return the parsed JSON.
+    """
+    cmd = ["yt-dlp", "--flat-playlist", "--dump-single-json", *extra_args, channel_url]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise Exception(f"yt-dlp failed: {result.stderr}")
+    return json.loads(result.stdout)
+
+
+def _entries_to_videos(entries):
+    return [_entry_to_video(entry) for entry in entries]
+
+
+def _entry_to_video(entry):
+    return {
+        "video_id": entry.get("id"),
+        "title": entry.get("title", "Untitled"),
+        "upload_date": entry.get("upload_date", "UnknownDate")
+    }
+
+
 def get_upload_date_for_video(video_id):
     """
     Attempt to get a real upload date in 'YYYY-MM-DD' via:
-      1) yt-dlp --dump-single-json https://www.youtube.com/watch?v=VIDEO_ID
+      1) the in-process yt-dlp engine, or if it's unavailable
+         yt-dlp --dump-single-json https://www.youtube.com/watch?v=VIDEO_ID
       2) fallback to pytube
     Return date string or None.
     """
-    # Try a single-video metadata query via yt-dlp
-    cmd = ["yt-dlp", "--dump-single-json", f"https://www.youtube.com/watch?v={video_id}"]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode == 0:
+    engine = get_engine()
+    if engine:
         try:
-            info = json.loads(result.stdout)
-            raw_date = info.get("upload_date")  # "YYYYMMDD"
-            if raw_date and len(raw_date) == 8:
-                return f"{raw_date[:4]}-{raw_date[4:6]}-{raw_date[6:8]}"
-        except (json.JSONDecodeError, KeyError):
+            real_date = format_upload_date(engine.get_video_info(video_id).get("upload_date"))
+            if real_date:
+                return real_date
+        except Exception:
             pass
+    else:
+        # Try a single-video metadata query via yt-dlp
+        cmd = ["yt-dlp", "--dump-single-json", f"https://www.youtube.com/watch?v={video_id}"]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode == 0:
+            try:
+                info = json.loads(result.stdout)
+                real_date = format_upload_date(info.get("upload_date"))  # "YYYYMMDD"
+                if real_date:
+                    return real_date
+            except (json.JSONDecodeError, KeyError):
+                pass
+
+    return _pytube_upload_date(video_id)
 
-    # Fallback to pytube
+
+def _pytube_upload_date(video_id):
     try:
         yt = YouTube(f"https://www.youtube.com/watch?v={video_id}")
         if yt.publish_date:
             return yt.publish_date.strftime("%Y-%m-%d")
     except Exception:
         pass
-
     return None
 
 
-def get_transcript_for_video(video_id):
+def get_transcript_for_video(video_id, language="en"):
     """
     Return a list of dicts => [ {"text":..., "start":..., "duration":...}, ...].
-    Attempt youtube_transcript_api first, fallback to pytube SRT captions.
+    Served from the local transcript cache when present; otherwise
+    attempt youtube_transcript_api first, fallback to pytube SRT captions,
+    and cache the result.
+    In replay mode, raise TranscriptCacheMiss instead of going to the network.
     Raise Exception if not found.
     """
+    cache = get_transcript_cache()
+    if cache:
+        cached = cache.get(video_id, language)
+        if cached is not None:
+            return cached
+        if cache.replay:
+            raise TranscriptCacheMiss(f"No cached '{language}' transcript for {video_id}")
+
+    segments = _fetch_transcript(video_id, language)
+    if cache:
+        cache.put(video_id, language, segments)
+    return segments
+
+
+def _fetch_transcript(video_id, language):
     try:
-        return YouTubeTranscriptApi.get_transcript(video_id, languages=['en'])
+        return YouTubeTranscriptApi.get_transcript(video_id, languages=[language])
     except NoTranscriptFound:
         logger.info(f"No transcript via youtube_transcript_api for '{video_id}', trying pytube.")
         yt = YouTube(f"https://www.youtube.com/watch?v={video_id}")
         caption = None
         for code, c in yt.captions.items():
-            if 'en' in code.lower():
+            if language in code.lower():
                 caption = c
                 break
         if caption is None:
-            raise Exception("No English caption found via pytube.")
+            raise Exception(f"No '{language}' caption found via pytube.")
         srt_captions = caption.generate_srt_captions()
         return parse_srt(srt_captions)
 
@@ -297,7 +1040,8 @@ def srt_time_to_seconds(t_str):
 def build_transcript_variants(transcript_entries):
     """
     Given [ {"text", "start", "duration"}, ... ],
-    build two text variants:
+    build two text variants (ingestion now stores db.transcript_segments
+    packed segments instead; kept for callers that want plain strings):
       1) transcript_with_ts => "[0.00s - 2.30s] Some text"
       2) transcript_no_ts   => "Some text"
     Return (with_ts, no_ts).
@@ -0,0 +1,149 @@
+# ytdlp_engine.py
+import os
+import queue
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+try:
+    import yt_dlp
+except ImportError:
+    yt_dlp = None  # callers fall back to the yt-dlp subprocess
+
+logger = logging.getLogger(__name__)
+
+
+class YtDlpEngine:
+    """
+    Drives yt-dlp through its Python API instead of one subprocess per call.
+
+    YoutubeDL objects (and the extractor instances they cache) are kept in an
+    idle pool and reused across calls and jobs. A YoutubeDL object is not
+    thread-safe, so each one is only ever borrowed by one thread at a time.
+    """
+    def __init__(self, max_workers=None):
+        if max_workers is None:
+            max_workers = int(os.getenv("YTDLP_METADATA_CONCURRENCY", "4"))
+        self.max_workers = max(1, max_workers)
+        self.params = {
+            "quiet": True,
+            "no_warnings": True,
+            "skip_download": True,
+            "extract_flat": "in_playlist",
+        }
+        self._idle = queue.LifoQueue()
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="ytdlp"
+        )
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return yt_dlp.YoutubeDL(self.params)
+
+    def _release(self, ydl):
+        self._idle.put(ydl)
+
+    @contextmanager
+    def _borrow(self):
+        ydl = self._acquire()
+        try:
+            yield ydl
+        finally:
+            self._release(ydl)
+
+    def _extract(self, ydl, url):
+        """
+        Unprocessed extraction: skips format resolution and keeps playlist
+        entries lazy. Redirects (e.g. channel handle -> uploads tab) are followed.
+        """
+        info = ydl.extract_info(url, download=False, process=False)
+        while info and info.get("_type") in ("url", "url_transparent"):
+            info = ydl.extract_info(
+                info["url"], download=False, process=False, ie_key=info.get("ie_key")
+            )
+        return info
+
+    def iter_playlist(self, url):
+        """
+        Return (playlist_id, entries) where entries is a lazy iterator of flat
+        entry dicts. yt-dlp fetches further playlist pages only as the
+        iterator is consumed, so callers can stop early.
+        """
+        ydl = self._acquire()
+        try:
+            info = self._extract(ydl, url)
+        except Exception:
+            self._release(ydl)
+            raise
+        playlist_id = info.get("id", "unknown_channel_id")
+
+        def entries():
+            # Later pages are fetched by the extractor bound to this
+            # YoutubeDL, so it stays borrowed until iteration ends.
+            try:
+                for entry in info.get("entries") or []:
+                    if entry:
+                        yield entry
+            finally:
+                self._release(ydl)
+
+        return playlist_id, entries()
+
+    def get_video_info(self, video_id):
+        with self._borrow() as ydl:
+            return self._extract(ydl, f"https://www.youtube.com/watch?v={video_id}")
+
+    def get_upload_dates(self, video_ids, guard=None):
+        """
+        Resolve many upload dates in one call, spread over the engine's
+        reused YoutubeDL instances. Returns { video_id: "YYYY-MM-DD" };
+        videos that could not be resolved are left out.
+        Each lookup goes through guard.call (a resilience.FetchGuard) if given.
+        """
+        def resolve(video_id):
+            try:
+                if guard:
+                    info = guard.call(self.get_video_info, video_id)
+                else:
+                    info = self.get_video_info(video_id)
+            except Exception as e:
+                logger.info(f"yt-dlp could not resolve upload date for {video_id}: {e}")
+                return video_id, None
+            return video_id, format_upload_date((info or {}).get("upload_date"))
+
+        dates = {}
+        for video_id, date in self._executor.map(resolve, list(video_ids)):
+            if date:
+                dates[video_id] = date
+        return dates
+
+
+def format_upload_date(raw_date):
+    """
+    'YYYYMMDD' => 'YYYY-MM-DD', or None if it isn't in that form.
+    """
+    if raw_date and len(raw_date) == 8:
+        return f"{raw_date[:4]}-{raw_date[4:6]}-{raw_date[6:8]}"
+    return None
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """
+    Return the process-wide engine, or None if the yt-dlp Python API is
+    unavailable or disabled with YTDLP_MODE=subprocess.
+    """
+    global _engine
+    if yt_dlp is None or os.getenv("YTDLP_MODE", "api").lower() == "subprocess":
+        return None
+    with _engine_lock:
+        if _engine is None:
+            _engine = YtDlpEngine()
+    return _engine